@@ -4,15 +4,15 @@ import copy
 import json
 
 from dash.dependencies import Input, Output, State
-import pandas as pd
 
 from app import app
 from .controls import GAS_COLORS, plot_layout
 from db.api import get_unique
 from .util import (
     _clean_search_dict, _get_fuel_species, _add_search_filter, MAIN_COLLECTION,
-    make_options
+    get_facet_index, make_options
 )
+from .facets import FACET_FIELDS
 
 
 @app.callback(
@@ -23,35 +23,18 @@ from .util import (
         Output('vent_cell_electrolytes', 'options'),
         Output('vent_cell_soc', 'options')],
     [
-        Input('db_data', 'children'),
         Input('vent_ref_pub', 'value'),
         Input('vent_cell_types', 'value'),
         Input('vent_cell_chemistry', 'value'),
         Input('vent_cell_electrolytes', 'value'),
         Input('vent_cell_soc', 'value')
     ])
-def update_dropdowns(data, publication, cell_type, chemistry, electrolyte,
-                     soc):
+def update_dropdowns(publication, cell_type, chemistry, electrolyte, soc):
     """ Update gas dropdown databa based on selections. """
-    df = pd.DataFrame(json.loads(data))
-
-    if publication:
-        df = df[df['Publication'] == publication]
-    if cell_type:
-        df = df[df['Format'] == cell_type]
-    if chemistry:
-        df = df[df['Chemistry'] == chemistry]
-    if electrolyte:
-        df = df[df['Electrolyte'] == electrolyte]
-    if soc:
-        df = df[df['SOC'] == soc]
-
-    fields = ['Publication', 'Format', 'Chemistry', 'Electrolyte', 'SOC']
-    results = []
-    for field in fields:
-        result = list(df[field].unique())
-        results.append(make_options(result))
-    return results
+    selection = dict(zip(FACET_FIELDS, [publication, cell_type, chemistry,
+                                        electrolyte, soc]))
+    values = get_facet_index().options(selection)
+    return [make_options(result) for result in values]
 
 
 @app.callback(
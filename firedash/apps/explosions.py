@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Explosion results of the vent calculator.
+
+Results are keyed on a hash of the normalized explosion inputs: fuel and
+air compositions, phi, f, P, T, the flame speed S actually used, R, Cd,
+Av, tmax and the number of points of the pressure trace. They are kept in a
+bounded in-memory LRU cache and in a bounded on-disk cache shared by all
+processes, so identical inputs from any session are only solved once. The
+hits, misses and solve time saved are counted over all processes of the
+host, in batches so lookups do not write to disk each time.
+"""
+
+import atexit
+import collections
+import os
+import threading
+import time
+
+import numpy as np
+
+from scripts.cache import Counters, DiskCache, LRUCache, make_key
+from scripts.downsample import lttb
+from scripts.equilibrium import normalize_composition
+from scripts.explosion_model import Explosion, solve_vent
+from scripts.flame_table import flame_speed
+
+# Max number of results in the on-disk cache
+DISK_SIZE = int(os.environ.get('FIREDASH_EXPLOSION_CACHE_SIZE', 1000))
+
+_memory = LRUCache(maxsize=256)
+_disk = DiskCache('explosions', maxsize=DISK_SIZE)
+_stats = Counters('explosions')
+
+# Lookups, or seconds, between writes of the counts to `_stats`
+FLUSH_LOOKUPS = 100
+FLUSH_SECONDS = 30
+
+# Counts of this process not yet written
+_pending = collections.Counter()
+_pending_lock = threading.Lock()
+_flush_time = time.monotonic()
+
+
+def explosion_key(gas, geom, cntrl, points):
+    """ Cache key of the inputs of an explosion.
+
+    Parameters
+    ----------
+    gas, geom, cntrl : Inputs
+        Inputs of the explosion.
+    points : Int
+        Points of the pressure trace.
+
+    Returns
+    -------
+    Unicode
+        Hash of the normalized inputs.
+    """
+    S = getattr(gas, 'S', None)
+    if S is None or np.isnan(S):
+        # Flame speed the model will look up
+        S = flame_speed(gas.fuel, gas.phi, T=gas.T, P=gas.P).S
+    return make_key('explosion', normalize_composition(gas.fuel),
+                    normalize_composition(gas.air), float(gas.phi),
+                    float(gas.f), float(gas.P), float(gas.T), float(S),
+                    float(geom.R), float(geom.Cd), float(geom.Av),
+                    float(cntrl.tmax), int(points))
+
+
+def get_result(key):
+    """ Cached result of an explosion, None if it was never solved. """
+    entry = _memory.get(key)
+    source = 'memory_hits'
+    if entry is None:
+        entry = _disk.get(key)
+        source = 'disk_hits'
+        if entry is not None:
+            _memory.set(key, entry)
+
+    if entry is None:
+        _count(misses=1)
+        return None
+    _count(**{source: 1, 'saved_seconds': entry['seconds']})
+    return entry['result']
+
+
+def _count(**amounts):
+    """ Add to the pending counts, written every `FLUSH_LOOKUPS` lookups
+    or `FLUSH_SECONDS`.
+    """
+    with _pending_lock:
+        _pending.update(amounts)
+        lookups = sum(_pending[key]
+                      for key in ['memory_hits', 'disk_hits', 'misses'])
+        due = (lookups >= FLUSH_LOOKUPS or
+               time.monotonic() - _flush_time >= FLUSH_SECONDS)
+    if due:
+        _flush()
+
+
+@atexit.register
+def _flush():
+    """ Write the pending counts of this process to `_stats`. """
+    global _flush_time
+    with _pending_lock:
+        amounts = dict(_pending)
+        _pending.clear()
+        _flush_time = time.monotonic()
+    if amounts:
+        _stats.add(**amounts)
+
+
+def set_result(key, result, seconds):
+    """ Cache the result of an explosion solved in `seconds`. """
+    entry = {'result': result, 'seconds': seconds}
+    _memory.set(key, entry)
+    _disk.set(key, entry)
+
+
+def cache_stats():
+    """ Hits, misses, hit rate and solve time saved by all processes, and
+    the number of results on disk. Counts of other processes not yet
+    written are left out.
+    """
+    _flush()
+    stats = _stats.get('memory_hits', 'disk_hits', 'misses', 'saved_seconds')
+    for key in ['memory_hits', 'disk_hits', 'misses']:
+        stats[key] = int(stats[key])
+    hits = stats['memory_hits'] + stats['disk_hits']
+    lookups = hits + stats['misses']
+    stats['hit_rate'] = hits / lookups if lookups else 0.0
+    stats['entries'] = len(_disk)
+    return stats
+
+
+def clear():
+    """ Clear the in-memory and the on-disk explosion caches and their
+    statistics.
+    """
+    _memory.clear()
+    _disk.clear()
+    with _pending_lock:
+        _pending.clear()
+    _stats.clear()
+
+
+def explosion_job(key, gas, geom, cntrl, points, progress=None):
+    """ Solve an explosion, downsample and cache its pressure trace.
+
+    Parameters
+    ----------
+    key : Unicode
+        Cache key of the inputs, from `explosion_key`.
+    gas, geom, cntrl : Inputs
+        Inputs of the explosion.
+    points : Int
+        Points of the pressure trace.
+    progress : Callable
+        Called with the partial result after each part of the time grid.
+
+    Returns
+    -------
+    Dict
+        Times 't', pressures 'P_', fraction of `tmax` solved 'progress',
+        peak pressure 'Pmax' and its time 't_max', flame speed 'Su' and
+        whether it is the default 'S_fallback'.
+    """
+    explosion = Explosion(gas=gas, geom=geom, cntrl=cntrl)
+    stopped = []
+
+    def result(t, P_):
+        peak = int(np.argmax(P_))
+        t_plot, P_plot = lttb(t, P_, points)
+        return {'t': t_plot, 'P_': P_plot, 'progress': t[-1] / cntrl.tmax,
+                'Pmax': float(P_[peak]), 't_max': float(t[peak]),
+                'Su': explosion.Su, 'S_fallback': explosion.S_fallback}
+
+    def report(t, x):
+        if progress is not None and progress(result(t, x[:, 0])) is False:
+            stopped.append(True)
+            return False
+
+    start = time.perf_counter()
+    explosion.run(progress=report)
+    final = result(explosion.t, explosion.P_)
+    if not stopped:
+        set_result(key, final, time.perf_counter() - start)
+    return final
+
+
+def min_area_job(gas, geom, cntrl, target, progress=None):
+    """ Find the minimum vent area keeping the overpressure below `target`.
+
+    Parameters
+    ----------
+    gas, geom, cntrl : Inputs
+        Inputs of the explosion, the vent area of `geom` is the initial
+        guess.
+    target : Float
+        Max overpressure (psi).
+    progress : Callable
+        Called with the smallest safe area so far before every trial.
+
+    Returns
+    -------
+    Float
+        Minimum vent area, None if no area meets the target or the search
+        was stopped.
+    """
+    return solve_vent(gas, geom, cntrl, target, parameter='Av',
+                      progress=progress)
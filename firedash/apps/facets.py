@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+# Fields of the experiment dropdowns
+FACET_FIELDS = ['Publication', 'Format', 'Chemistry', 'Electrolyte', 'SOC']
+
+
+class FacetIndex():
+    """ Faceted index of the experiment catalog.
+
+    Every value of a field maps to the bitset (a Python int) of the rows
+    having that value. A selection is the intersection of the bitsets of
+    the selected values, and the options of a field are its values with
+    rows left in the selection.
+
+    Parameters
+    ----------
+    rows : List
+        Catalog rows, as dicts.
+    fields : List
+        Fields to index.
+    """
+
+    def __init__(self, rows, fields=FACET_FIELDS):
+        self.fields = fields
+        self.size = len(rows)
+        self.all = (1 << self.size) - 1
+        self.bits = {field: {} for field in fields}
+
+        for i, row in enumerate(rows):
+            bit = 1 << i
+            for field in fields:
+                value = row.get(field)
+                bits = self.bits[field]
+                bits[value] = bits.get(value, 0) | bit
+
+    def select(self, selection):
+        """ Bitset of the rows matching a selection.
+
+        Parameters
+        ----------
+        selection : Dict
+            Selected value by field, empty values select everything.
+
+        Returns
+        -------
+        Int
+            Bitset of the matching rows.
+        """
+        mask = self.all
+        for field, value in selection.items():
+            if value:
+                mask &= self.bits[field].get(value, 0)
+        return mask
+
+    def options(self, selection):
+        """ Values of every field left in a selection.
+
+        Values are in the order of their first row in the selection.
+
+        Parameters
+        ----------
+        selection : Dict
+            Selected value by field.
+
+        Returns
+        -------
+        List
+            List of values for every field in `fields`.
+        """
+        mask = self.select(selection)
+        results = []
+        for field in self.fields:
+            values = []
+            for value, bits in self.bits[field].items():
+                bits &= mask
+                if bits:
+                    # Index of the lowest set bit, the first matching row
+                    values.append(((bits & -bits).bit_length(), value))
+            results.append([value for _, value in sorted(
+                values, key=lambda item: item[0])])
+        return results
@@ -7,16 +7,15 @@ import dash_core_components as dcc
 import dash_html_components as html
 import dash_table
 from dash.dependencies import Input, Output
-import numpy as np
-import pandas as pd
-from plotly.figure_factory import create_ternary_contour
 
 from app import app
 from .callbacks import *  # noqa
 from .controls import plot_layout
 from .layouts import main_dropdowns
+from .ternary import get_ternary_traces
 from .util import (
-    get_flammability_data, TERNARY_OPTIONS, X_AXIS_OPTIONS, Y_AXIS_OPTIONS
+    get_flammability_arrays, get_flammability_summary, make_unique_id,
+    TERNARY_OPTIONS, X_AXIS_OPTIONS, Y_AXIS_OPTIONS
 )
 
 
@@ -190,12 +189,24 @@ layout = html.Div(
     Output('flammability_data', 'children'),
     [Input('selected_experiment', 'children')])
 def update_flammability_data(experiment):
-    """ Load experiment data based on selected experiment. """
-    data = None
+    """ Select the experiment data, only its id goes to the browser. """
+    id = None
     if experiment:
-        data = get_flammability_data(json.loads(experiment))
+        id = make_unique_id(json.loads(experiment))
 
-    return json.dumps(data)
+    return json.dumps(id)
+
+
+def _flammable(arrays):
+    """ Mask of the flammable mixtures without inert. """
+    return (arrays['Xi'] == 0) & (arrays['Flammable'] == 1)
+
+
+def _format_metric(value, unit, scale=1):
+    """ Format a summary metric, N/A if it is missing. """
+    if value is None:
+        return f'N/A {unit}'
+    return '{0:.2f} {1}'.format(value * scale, unit)
 
 
 @app.callback(
@@ -208,26 +219,19 @@ def update_summary_table(flammability_data):
             {'param': 'Laminar Flame Speed', 'value': 'm/s'},
             {'param': 'Max Adiabatic Pressure', 'value': 'bar'}]
 
-    flammability_data = json.loads(flammability_data)
+    id = json.loads(flammability_data)
 
-    if flammability_data is not None:
-        flammability_data.pop('_id')
-        df = pd.DataFrame.from_dict(flammability_data,
-                                    orient='index').transpose()
-
-        ufl = max(df[(df.Xi == 0) & (df.Flammable == 1)].Xf) * 100
-        lfl = min(df[(df.Xi == 0) & (df.Flammable == 1)].Xf) * 100
-        su = max(df.Su)
-        p_max = max(df.Pmax)
+    if id is not None:
+        summary = get_flammability_summary(id)
 
         data = [{'param': 'Lower Flammability Limit',
-                 'value': '{0:.2f} %'.format(lfl)},
+                 'value': _format_metric(summary['LFL'], '%', 100)},
                 {'param': 'Upper Flammability Limit',
-                 'value': '{0:.2f} %'.format(ufl)},
+                 'value': _format_metric(summary['UFL'], '%', 100)},
                 {'param': 'Laminar Flame Speed',
-                 'value': '{0:.2f} m/s'.format(su)},
+                 'value': _format_metric(summary['Su'], 'm/s')},
                 {'param': 'Max Adiabatic Pressure',
-                 'value': '{0:.2f} bar'.format(p_max)}]
+                 'value': _format_metric(summary['Pmax'], 'bar')}]
 
     return data
 
@@ -248,14 +252,14 @@ def make_summary_plot(flammability_data, x_axis, y_axis, x_label, y_label):
     x_label = x_label or 'Equivalence Ratio'
     y_label = y_label or 'Laminar Flame Speed'
 
-    flammability_data = json.loads(flammability_data)
+    id = json.loads(flammability_data)
 
-    if flammability_data is not None:
-        flammability_data.pop('_id')
-        df = pd.DataFrame.from_dict(flammability_data,
-                                    orient='index').transpose()
-        x_data = list(df[(df.Xi == 0) & (df.Flammable == 1)][x_axis])
-        y_data = list(df[(df.Xi == 0) & (df.Flammable == 1)][y_axis])
+    arrays = get_flammability_arrays(id) if id is not None else {}
+    # Maps without the column of an axis, e.g. no flame speeds, stay empty
+    if x_axis in arrays and y_axis in arrays:
+        flammable = _flammable(arrays)
+        x_data = arrays[x_axis][flammable]
+        y_data = arrays[y_axis][flammable]
 
         data = [
             dict(
@@ -284,44 +288,10 @@ def make_summary_plot(flammability_data, x_axis, y_axis, x_label, y_label):
 def make_ternary_plot(flammability_data, dropdown_value):
     """ Make ternary graph from flammability data. """
     data = []
+    id = json.loads(flammability_data) if flammability_data else None
 
-    if flammability_data and dropdown_value:
-        flammability_data = json.loads(flammability_data)
-
-        xf = flammability_data['Xf']
-        xa = flammability_data['Xa']
-        xi = flammability_data['Xi']
-        z = np.array(flammability_data[dropdown_value])
-
-        colorscale = 'Hot'
-        ncontours = None
-        showscale = True
-
-        if dropdown_value == 'phi':
-            # Cap phi values at 2
-            for i, value in enumerate(z):
-                if value > 2:
-                    z[i] = 2
-
-            ncontours = 8
-            colorscale = 'Rainbow'
-
-        if dropdown_value == 'Flammable':
-            ncontours = 2
-            showscale = False
-
-        figure = create_ternary_contour(np.array([xf, xa, xi]), z,
-                                        pole_labels=['Fuel', 'Air', 'Inert'],
-                                        interp_mode='cartesian',
-                                        colorscale=colorscale,
-                                        showscale=showscale,
-                                        ncontours=ncontours)
-
-        data = figure.to_plotly_json()['data']
-
-        # Clean up
-        for item in data:
-            item.pop('showlegend', None)
+    if id is not None and dropdown_value:
+        data = get_ternary_traces(id, dropdown_value)
 
     layout = copy.deepcopy(plot_layout)
     layout['title'] = 'Ternary Contour Plot'
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Background simulation jobs of the dashboard.
+
+Simulations run in a process pool so the server threads stay free for the
+other callbacks. Every browser session has at most one current job: a new
+job supersedes the previous one of the session, which is cancelled if it is
+still queued and stops at its next progress report if it is running. The
+state of the jobs, with their partial results, is kept in a `DiskCache` so
+that every server process can poll any job. The states of superseded jobs
+are deleted, and those not updated for `JOB_TTL` are deleted on the next
+submit.
+"""
+
+import concurrent.futures
+import os
+import threading
+import uuid
+
+from scripts.cache import DiskCache, LRUCache
+
+# Worker processes of the simulations
+JOB_WORKERS = int(os.environ.get('FIREDASH_JOB_WORKERS', 2))
+
+# Seconds after which a job state is deleted
+JOB_TTL = 3600
+
+QUEUED, RUNNING, DONE, ERROR = 'queued', 'running', 'done', 'error'
+
+# Job states by job id, and current job id by session
+_jobs = DiskCache('jobs')
+# Futures of the jobs submitted by this process, by session
+_futures = LRUCache(maxsize=1024)
+
+_executor = None
+_pid = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    """ Get the process pool of this server process, created on first use.
+    """
+    global _executor, _pid
+
+    with _lock:
+        if _executor is None or _pid != os.getpid():
+            _executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=JOB_WORKERS)
+            _pid = os.getpid()
+        return _executor
+
+
+def _session_key(session):
+    return 'session:' + session
+
+
+def is_current(session, job):
+    """ Whether a job is the current job of its session. """
+    return _jobs.get(_session_key(session)) == job
+
+
+def submit(session, function, *args):
+    """ Run a function as the new job of a session.
+
+    Parameters
+    ----------
+    session : Unicode
+        Id of the browser session.
+    function : Callable
+        Picklable function, called with `args` and a `progress` keyword
+        argument. `progress(partial)` records a partial result and returns
+        False once the job is superseded.
+    args : List
+        Picklable arguments of the function.
+
+    Returns
+    -------
+    Unicode
+        Id of the job.
+    """
+    cancel(session)
+    _jobs.prune(JOB_TTL)
+    job = uuid.uuid4().hex
+    _jobs.set(job, {'status': QUEUED, 'result': None})
+    _jobs.set(_session_key(session), job)
+    try:
+        future = get_executor().submit(_run, session, job, function, args)
+    except concurrent.futures.process.BrokenProcessPool:
+        # A worker died, start a new pool
+        reset()
+        future = get_executor().submit(_run, session, job, function, args)
+    future.add_done_callback(
+        lambda future: _check_failure(session, job, future))
+    _futures.set(session, future)
+    return job
+
+
+def finish(session, result):
+    """ Record a known result as the new, finished job of a session.
+
+    Returns
+    -------
+    Unicode
+        Id of the job.
+    """
+    cancel(session)
+    job = uuid.uuid4().hex
+    _jobs.set(job, {'status': DONE, 'result': result})
+    _jobs.set(_session_key(session), job)
+    return job
+
+
+def reset():
+    """ Drop the process pool of this server process. """
+    global _executor
+
+    with _lock:
+        if _executor is not None and _pid == os.getpid():
+            _executor.shutdown(wait=False)
+        _executor = None
+
+
+def cancel(session):
+    """ Cancel the current job of a session, if any. """
+    previous = _jobs.get(_session_key(session))
+    if previous is None:
+        return
+    _jobs.delete(_session_key(session))
+    _jobs.delete(previous)
+    future = _futures.get(session)
+    if future is not None:
+        future.cancel()
+
+
+def poll(job):
+    """ State of a job.
+
+    Returns
+    -------
+    Dict
+        'status' and 'result' (partial while running) of the job, or
+        'error' message. None for an unknown, cancelled or expired job.
+    """
+    if not job:
+        return None
+    return _jobs.get(job, ttl=JOB_TTL)
+
+
+def _check_failure(session, job, future):
+    """ Record the failure of a job outside of its function. """
+    if future.cancelled() or future.exception() is None:
+        return
+    if is_current(session, job):
+        _jobs.set(job, {'status': ERROR, 'result': None,
+                        'error': str(future.exception())})
+
+
+def _run(session, job, function, args):
+    """ Run a job in a worker process. """
+    def progress(partial):
+        if not is_current(session, job):
+            return False
+        _jobs.set(job, {'status': RUNNING, 'result': partial})
+        return True
+
+    if not is_current(session, job):
+        return
+    try:
+        result = function(*args, progress=progress)
+    except Exception as error:
+        state = {'status': ERROR, 'result': None, 'error': str(error)}
+    else:
+        state = {'status': DONE, 'result': result}
+    if is_current(session, job):
+        _jobs.set(job, state)
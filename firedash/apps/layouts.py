@@ -3,8 +3,6 @@
 import dash_core_components as dcc
 import dash_html_components as html
 
-from .util import get_main_data
-
 
 main_dropdowns = html.Div(
     [
@@ -16,11 +14,6 @@ main_dropdowns = html.Div(
                 "margin-bottom": "10px"
             }
         ),
-        html.Div(
-            id='db_data',
-            children=get_main_data(),
-            style={'display': 'none'}
-        ),
         html.Div(
             [
                 html.Label(
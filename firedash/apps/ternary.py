@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+
+import numpy as np
+import plotly.colors as clrs
+from scipy.sparse import csr_matrix
+from scipy.spatial import Delaunay
+from skimage import measure
+
+from scripts.cache import LRUCache
+from .util import cached_figure, get_flammability_arrays
+
+POLE_LABELS = ['Fuel', 'Air', 'Inert']
+
+# Vertices (x, y) of the Fuel, Air and Inert poles in the plane of the
+# contour grid of `create_ternary_contour`
+TRIANGLE = np.array([[0.5, np.sqrt(3) / 2], [0, 0], [1, 0]])
+
+# Interpolators by checksum of their point set
+_interpolators = LRUCache(maxsize=8)
+
+# Contour settings of the ternary views
+TERNARY_SETTINGS = {
+    'Tad': {'colorscale': 'Hot', 'ncontours': None, 'showscale': True,
+            'cap': None},
+    # Cap phi values at 2
+    'phi': {'colorscale': 'Rainbow', 'ncontours': 8, 'showscale': True,
+            'cap': 2},
+    'Flammable': {'colorscale': 'Hot', 'ncontours': 2, 'showscale': False,
+                  'cap': None},
+    'Su': {'colorscale': 'Hot', 'ncontours': None, 'showscale': True,
+           'cap': None},
+    'Pmax': {'colorscale': 'Hot', 'ncontours': None, 'showscale': True,
+             'cap': None},
+}
+DEFAULT_SETTINGS = TERNARY_SETTINGS['Tad']
+
+
+def to_cartesian(coordinates):
+    """ Points (x, y) of ternary coordinates, shape (3, n), in the plane
+    of the contour grid.
+    """
+    coordinates = np.asarray(coordinates, dtype=float)
+    coordinates = coordinates / coordinates.sum(axis=0)
+    return np.dot(TRIANGLE.T, coordinates)
+
+
+def checksum(arrays):
+    """ Checksum of the data of a flammability map. """
+    digest = hashlib.sha1()
+    for key in sorted(arrays):
+        digest.update(key.encode('utf-8'))
+        digest.update(np.ascontiguousarray(arrays[key]).tobytes())
+    return digest.hexdigest()
+
+
+class TernaryInterpolator():
+    """ Linear interpolation of ternary data onto the contour grid.
+
+    The points are triangulated once, and the barycentric weights of every
+    grid node in its triangle are kept in a sparse matrix. Interpolating a
+    field of the points is then one sparse matrix-vector product. The grid
+    is the one of `create_ternary_contour` in 'cartesian' mode.
+
+    Parameters
+    ----------
+    coordinates : ndarray
+        Ternary coordinates of the points, shape (3, n).
+    """
+
+    def __init__(self, coordinates):
+        self.coordinates = np.asarray(coordinates, dtype=float)
+        points = to_cartesian(coordinates).T
+
+        n_interp = max(200, int(np.sqrt(len(points))))
+        self.gr_x = np.linspace(points[:, 0].min(), points[:, 0].max(),
+                                n_interp)
+        self.gr_y = np.linspace(points[:, 1].min(), points[:, 1].max(),
+                                n_interp)
+        self.shape = (n_interp, n_interp)
+        grid_x, grid_y = np.meshgrid(self.gr_x, self.gr_y)
+        grid = np.column_stack((grid_x.ravel(), grid_y.ravel()))
+
+        triangulation = Delaunay(points)
+        simplex = triangulation.find_simplex(grid)
+        inside = simplex >= 0
+        self.outside = ~inside
+
+        # Barycentric weights of the nodes inside the convex hull
+        transform = triangulation.transform[simplex[inside]]
+        weights = np.einsum('ijk,ik->ij', transform[:, :2],
+                            grid[inside] - transform[:, 2])
+        weights = np.column_stack((weights, 1 - weights.sum(axis=1)))
+
+        rows = np.repeat(np.flatnonzero(inside), 3)
+        columns = triangulation.simplices[simplex[inside]].ravel()
+        self.matrix = csr_matrix((weights.ravel(), (rows, columns)),
+                                 shape=(grid.shape[0], len(points)))
+
+    def interpolate(self, values):
+        """ Field on the grid, NaN outside the convex hull of the points.
+        """
+        z = self.matrix.dot(np.asarray(values, dtype=float))
+        z[self.outside] = np.nan
+        return z.reshape(self.shape)
+
+
+def get_interpolator(arrays):
+    """ Get the interpolator of the point set of a flammability map. """
+    coordinates = np.array([arrays['Xf'], arrays['Xa'], arrays['Xi']])
+    key = checksum({'coordinates': coordinates})
+    interpolator = _interpolators.get(key)
+    if interpolator is None:
+        interpolator = TernaryInterpolator(coordinates)
+        _interpolators.set(key, interpolator)
+    return interpolator
+
+
+def _colors(ncontours, colorscale):
+    """ Colors evenly spaced on a named plotly colorscale. """
+    scale = clrs.PLOTLY_SCALES[colorscale]
+    positions = np.array([pair[0] for pair in scale])
+    colors = [pair[1] for pair in scale]
+    if '#' in colors[0]:
+        colors = [clrs.label_rgb(clrs.hex_to_rgb(color)) for color in colors]
+
+    values = np.linspace(0, 1, ncontours)
+    result = [colors[0]]
+    for index, value in zip(np.searchsorted(positions, values)[1:],
+                            values[1:]):
+        low, high = positions[index - 1], positions[index]
+        result.append(clrs.find_intermediate_color(
+            colors[index - 1], colors[index], (value - low) / (high - low),
+            colortype='rgb'))
+    return result
+
+
+def _polygon_area(x, y):
+    return 0.5 * np.abs(np.dot(x, np.roll(y, 1)) - np.dot(y, np.roll(x, 1)))
+
+
+def _find_contours(z, levels, colors):
+    """ Contours of the levels of a grid with NaN outside of the triangle.
+
+    The outside is filled below or above all values, whichever gives the
+    fewest contours, so that no spurious contours follow the border.
+
+    Returns
+    -------
+    List
+        (contour, level, area, color) of every contour.
+    """
+    inside = z[~np.isnan(z)]
+    candidates = []
+    for outside in (2 * inside.min(), 2 * inside.max()):
+        filled = np.where(np.isnan(z), outside, z)
+        contours = []
+        for level, color in zip(levels, colors):
+            for contour in measure.find_contours(filled, level):
+                contours.append((contour, level,
+                                 _polygon_area(contour.T[1], contour.T[0]),
+                                 color))
+        candidates.append(contours)
+    return min(candidates, key=len)
+
+
+def _contour_traces(interpolator, values, settings, hover=False):
+    """ Filled contour traces of a field, like `create_ternary_contour` in
+    'cartesian' mode, with invisible markers showing the values of the
+    points on hover if `hover`.
+    """
+    colorscale = settings['colorscale']
+    ncontours = settings['ncontours'] or 5
+    v_min, v_max = values.min(), values.max()
+    z = interpolator.interpolate(values)
+
+    # The extreme colors and levels only fill the background
+    colors = _colors(ncontours + 2, colorscale)
+    levels = np.linspace(v_min, v_max, ncontours + 2)
+    contours = _find_contours(z, levels[1:-1], colors[1:-1])
+    contours.sort(key=lambda contour: contour[2], reverse=True)
+
+    # Background in the color next to the one of the largest contour,
+    # towards the closest end of the colorscale
+    index = list(levels).index(contours[0][1]) if contours else 1
+    index += -1 if index < len(levels) / 2 else 1
+    background = colors[index]
+
+    used = [color for color in colors if color == background or
+            any(color == contour[3] for contour in contours)]
+    bounds = np.linspace(0, 1, len(used) + 1)
+    discrete_cm = []
+    for i, color in enumerate(used):
+        discrete_cm += [[bounds[i], color], [bounds[i + 1], color]]
+    discrete_cm.append([bounds[-1], used[-1]])
+
+    data = [_contour_trace([1, 0, 0], [0, 1, 0], [0, 0, 1], levels[index],
+                           background)]
+
+    # Grid indices to ternary coordinates
+    dx = (interpolator.gr_x.max() - interpolator.gr_x.min()) / \
+        interpolator.gr_x.size
+    dy = (interpolator.gr_y.max() - interpolator.gr_y.min()) / \
+        interpolator.gr_y.size
+    inverse = np.linalg.inv(np.vstack((TRIANGLE.T, np.ones(3))))
+    for contour, level, _, color in contours:
+        y, x = contour.T
+        # Contours of about one pixel are spurious
+        if np.all(np.abs(x - x[0]) < 2) and np.all(np.abs(y - y[0]) < 2):
+            continue
+        a, b, c = np.dot(inverse, np.stack((dx * x, dy * y, np.ones(x.shape))))
+        data.append(_contour_trace(a, b, c, level, color))
+
+    if hover:
+        _append_hover_trace(data, interpolator.coordinates, values,
+                            colorscale)
+
+    if settings['showscale']:
+        data.append({
+            'type': 'scatterternary',
+            'a': [None],
+            'b': [None],
+            'c': [None],
+            'marker': {'cmin': v_min, 'cmax': v_max,
+                       'colorscale': discrete_cm, 'showscale': True},
+            'mode': 'markers',
+        })
+
+    return data
+
+
+def _contour_trace(a, b, c, level, color):
+    """ Filled ternary trace of a contour. """
+    return {
+        'type': 'scatterternary',
+        'a': a,
+        'b': b,
+        'c': c,
+        'mode': 'lines',
+        'line': {'color': 'rgb(150, 150, 150)', 'shape': 'spline',
+                 'width': 1},
+        'fill': 'toself',
+        'fillcolor': color,
+        'hoverinfo': 'skip',
+        'name': '%.3f' % level,
+    }
+
+
+def _append_hover_trace(data, coordinates, values, colorscale):
+    """ Add invisible markers with the values of all points on hover. """
+    a, b, c = coordinates
+    data.append({
+        'type': 'scatterternary',
+        'a': a,
+        'b': b,
+        'c': c,
+        'mode': 'markers',
+        'marker': {'color': values, 'colorscale': colorscale,
+                   'line': {'color': 'rgb(120, 120, 120)', 'width': 1}},
+        'opacity': 0,
+        'hovertemplate': ''.join(
+            f'{label}: %{{{axis}:.3f}}<br>'
+            for label, axis in zip(POLE_LABELS, 'abc')) +
+        'z: %{marker.color:.3f}<extra></extra>',
+    })
+
+
+def ternary_traces(arrays, variable, hover=False):
+    """ Make the traces of the ternary contour plot of a variable.
+
+    Parameters
+    ----------
+    arrays : Dict
+        Flammability data, array by column name.
+    variable : Unicode
+        Column to plot.
+    hover : Bool
+        Add a trace of invisible markers showing the values of all points
+        on hover. It is about as large as the data, so it is off by default.
+
+    Returns
+    -------
+    List
+        Plotly traces.
+    """
+    settings = TERNARY_SETTINGS.get(variable, DEFAULT_SETTINGS)
+    z = np.asarray(arrays[variable], dtype=float)
+    if settings['cap'] is not None:
+        z = np.minimum(z, settings['cap'])
+
+    return _contour_traces(get_interpolator(arrays), z, settings, hover)
+
+
+def get_ternary_traces(id, variable, hover=False):
+    """ Get the ternary traces of a variable of an experiment id.
+
+    Traces are cached by experiment, variable, contour settings, hover
+    trace and checksum of the map, and shared by all workers.
+    """
+    arrays = get_flammability_arrays(id)
+    if variable not in arrays:
+        return []
+
+    settings = TERNARY_SETTINGS.get(variable, DEFAULT_SETTINGS)
+    key = ['ternary', id, variable, settings, hover, checksum(arrays)]
+    return cached_figure(key, lambda: ternary_traces(arrays, variable,
+                                                     hover))
+
+
+def warm_ternary_traces(id, variables=None):
+    """ Compute the ternary traces of an experiment id ahead of requests.
+    """
+    for variable in variables or TERNARY_SETTINGS:
+        get_ternary_traces(id, variable)
@@ -1,12 +1,18 @@
 # -*- coding: utf-8 -*-
 
+import collections
 import json
+import os
+import threading
+import time
 
-from db.api import find
+from db import cache as db_cache
+from db.api import DB_BACKEND, find
+from db.flammability import decode_document, summarize
+from db.ids import SEARCH_GASES, experiment_id, fuel_species
+from scripts.cache import LRUCache, make_key
+from .facets import FacetIndex
 
-# Constants
-CANTERA_GASES = ['CO2', 'CO', 'H2', 'CH4', 'C2H4', 'C2H6', 'C3H8', 'N2', 'O2',
-                 'CH3OH']
 # Air composition
 AIR_SPECIES = {'O2': 1, 'N2': 3.76}
 
@@ -14,7 +20,9 @@ AIR_SPECIES = {'O2': 1, 'N2': 3.76}
 # Ternary graph options
 TERNARY_OPTIONS = [{'label': 'Adiabatic Temperature', 'value': 'Tad'},
                    {'label': 'Equivalence Ratio', 'value': 'phi'},
-                   {'label': 'Flammability', 'value': 'Flammable'}]
+                   {'label': 'Flammability', 'value': 'Flammable'},
+                   {'label': 'Laminar Flame Speed', 'value': 'Su'},
+                   {'label': 'Adiabatic Pressure', 'value': 'Pmax'}]
 
 # x-axis options for summary plot
 X_AXIS_OPTIONS = [{'label': 'Equivalence Ratio', 'value': 'phi'},
@@ -30,6 +38,19 @@ Y_AXIS_OPTIONS = [{'label': 'Equivalence Ratio', 'value': 'phi'},
 MAIN_COLLECTION = 'main'
 FLAMMABILITY_COLLECTION = 'flammability'
 
+# Seconds database reads stay cached, shared by all workers of a host
+CACHE_TTL = int(os.environ.get('FIREDASH_CACHE_TTL', 24 * 3600))
+
+_cache = db_cache.reads
+# Figures computed from the database, shared by all workers
+_figures = db_cache.figures
+# Parsed flammability arrays and their read time by experiment id
+_arrays = LRUCache(maxsize=32)
+_cache_stats = collections.Counter()
+_cache_lock = threading.Lock()
+_facet_index = None
+_facet_time = 0
+
 
 def _clean_search_dict(search):
     """ Replace 'N/A' values with None in search dict. """
@@ -40,22 +61,14 @@ def _clean_search_dict(search):
 
 def _get_fuel_species(gases):
     """ Make all non-Cantera gases Propane (C3H8). """
-    fuel_species = gases.copy()
-
-    for gas, quantity in gases.items():
-        if gas not in CANTERA_GASES:
-            fuel_species['C3H8'] += quantity
-            fuel_species.pop(gas)
-
-    return fuel_species
+    return fuel_species(gases)
 
 
 def _add_search_filter(search=None):
     """ Add filter to ensure presence of CO2, H2, CH4 or C3H8. """
     search_filter = {
         "$and": [
-            {"$or": [{'Gases.CO2': {'$gt': 0}}, {'Gases.H2': {'$gt': 0}},
-                     {'Gases.CH4': {'$gt': 0}}, {'Gases.C3H8': {'$gt': 0}}]}
+            {"$or": [{f'Gases.{gas}': {'$gt': 0}} for gas in SEARCH_GASES]}
         ]
     }
     if search:
@@ -73,34 +86,166 @@ def make_options(values):
     return options
 
 
+class _Missing():
+    """ Cached value of a read that found nothing. """
+
+
+def _cached(key, compute):
+    """ Get a cached database read, `compute` it on a miss.
+
+    A None result is cached too, so missing documents are not read again.
+    """
+    key = make_key(DB_BACKEND, key)
+    value = _cache.get(key, ttl=CACHE_TTL)
+    with _cache_lock:
+        _cache_stats['hits' if value is not None else 'misses'] += 1
+
+    if value is None:
+        value = compute()
+        _cache.set(key, _Missing() if value is None else value)
+    elif isinstance(value, _Missing):
+        value = None
+    return value
+
+
+def _generation():
+    """ Time of the last invalidation by any process. """
+    return db_cache.generation()
+
+
+def cached_figure(key, compute):
+    """ Get a cached figure, `compute` it on a miss.
+
+    The key must identify the data of the figure, e.g. by a checksum, so a
+    changed map never gets the figure of the old one.
+    """
+    key = make_key(DB_BACKEND, key)
+    value = _figures.get(key, ttl=CACHE_TTL)
+    with _cache_lock:
+        _cache_stats['figure_hits' if value is not None
+                     else 'figure_misses'] += 1
+
+    if value is None:
+        value = compute()
+        _figures.set(key, value)
+    return value
+
+
+def cache_stats():
+    """ Hits and misses of the database and figure caches in this process.
+    """
+    with _cache_lock:
+        return {key: _cache_stats[key] for key in
+                ['hits', 'misses', 'figure_hits', 'figure_misses']}
+
+
+def invalidate_cache():
+    """ Drop all cached database reads and figures, e.g. after a data
+    update.
+
+    The in-memory arrays and facet index of the other processes are
+    dropped on their next use.
+    """
+    global _facet_index
+
+    db_cache.invalidate()
+    _arrays.clear()
+    with _cache_lock:
+        _facet_index = None
+
+
 def get_main_data():
     """ Get data in main collection in JSON serialized form. """
     search = _add_search_filter()
     cols = {'Publication': 1, 'Format': 1, 'Chemistry': 1, 'Electrolyte': 1,
             'SOC': 1, '_id': 0}
-    results = find(collection=MAIN_COLLECTION, search=search, projection=cols)
-    data = json.dumps(list(results))
-    return data
+
+    def compute():
+        results = find(collection=MAIN_COLLECTION, search=search,
+                       projection=cols)
+        return json.dumps(list(results))
+
+    return _cached([MAIN_COLLECTION, search, cols], compute)
+
+
+def get_facet_index():
+    """ Get the facet index of the main data, rebuilt after `CACHE_TTL`
+    or an invalidation.
+
+    The catalog is read on the first dropdown update, never at import, so
+    the app starts without the database. The index replaces the catalog
+    that was sent to the browser on every page view.
+    """
+    global _facet_index, _facet_time
+
+    generation = _generation()
+    with _cache_lock:
+        index = _facet_index
+        if (index is not None and time.time() - _facet_time < CACHE_TTL and
+                _facet_time >= generation):
+            return index
+
+    index = FacetIndex(json.loads(get_main_data()))
+    with _cache_lock:
+        _facet_index = index
+        _facet_time = time.time()
+    return index
 
 
 def get_flammability_data(experiment):
     """ Get flammability data for a selected experiment. """
-    id = make_unique_id(experiment)
-    results = list(find(collection=FLAMMABILITY_COLLECTION,
-                        search={'_id': id}))
-    return results[0]
+    return get_flammability_document(make_unique_id(experiment))
 
 
-def make_unique_id(experiment):
-    """ Make id from selected experiment. """
-    experiment.pop('Electrolyte')
-    experiment.pop('Format')
+def get_flammability_document(id):
+    """ Get the flammability document of an experiment id. """
+    def compute():
+        results = list(find(collection=FLAMMABILITY_COLLECTION,
+                            search={'_id': id}))
+        return results[0] if results else None
+
+    return _cached([FLAMMABILITY_COLLECTION, id], compute)
 
-    id = []
-    for value in experiment.values():
-        value = str(value)
-        value = value.lower()
-        value = value.replace(',', '')
-        id.append('-'.join(value.split()))
 
-    return '-'.join(id)
+def get_flammability_summary(id):
+    """ Get the summary metrics of an experiment id.
+
+    Only the stored summary is read, documents written before summaries
+    existed are summarized from their arrays.
+    """
+    def compute():
+        results = list(find(collection=FLAMMABILITY_COLLECTION,
+                            search={'_id': id},
+                            projection={'summary': 1, '_id': 0}))
+        return results[0].get('summary') if results else None
+
+    summary = _cached([FLAMMABILITY_COLLECTION, id, 'summary'], compute)
+    if summary is None:
+        summary = summarize(get_flammability_arrays(id))
+    return summary
+
+
+def get_flammability_arrays(id):
+    """ Get the flammability data of an experiment id as numpy arrays.
+
+    The arrays are parsed once per process and `CACHE_TTL`, like the
+    database reads, or again after an invalidation, and shared by all
+    callbacks. They are read-only. An experiment without a map has no
+    arrays.
+    """
+    entry = _arrays.get(id)
+    if (entry is not None and time.time() - entry[0] < CACHE_TTL and
+            entry[0] >= _generation()):
+        return entry[1]
+
+    document = get_flammability_document(id)
+    if document is None:
+        return {}
+    arrays = decode_document(document)
+    _arrays.set(id, (time.time(), arrays))
+    return arrays
+
+
+def make_unique_id(experiment):
+    """ Make id from selected experiment. """
+    return experiment_id(experiment)
@@ -2,18 +2,28 @@
 
 import copy
 import json
+import os
+import uuid
 
 import dash_core_components as dcc
 import dash_html_components as html
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 
 from app import app
 from .callbacks import *  # noqa
+from . import explosions, jobs
 from .controls import plot_layout
 from .layouts import main_dropdowns
-from scripts.explosion_model import Explosion, Inputs, Patm
+from scripts.explosion_model import Inputs, Patm
 from .util import _get_fuel_species, AIR_SPECIES
 
+# Points of the pressure trace sent to the browser
+PLOT_POINTS = int(os.environ.get('FIREDASH_PLOT_POINTS', 500))
+
+# Milliseconds between polls of a running simulation
+POLL_INTERVAL = 500
+
 
 # Create app layout
 layout = html.Div(
@@ -86,6 +96,7 @@ layout = html.Div(
                                 dcc.Input(
                                     id="vent_room_rad",
                                     type="number",
+                                    debounce=True,
                                     min=0,
                                     placeholder="Radius (m)",
                                     className="control_label"
@@ -99,6 +110,7 @@ layout = html.Div(
                                 dcc.Input(
                                     id="vent_area",
                                     type="number",
+                                    debounce=True,
                                     min=0,
                                     placeholder="Area (m^2)",
                                     className="control_label"
@@ -112,6 +124,7 @@ layout = html.Div(
                                 dcc.Input(
                                     id="vent_drag",
                                     type="number",
+                                    debounce=True,
                                     min=0,
                                     placeholder="Drag Coeff",
                                     className="control_label"
@@ -119,6 +132,24 @@ layout = html.Div(
                             ],
                             className="control_label"
                         ),
+                        html.Label(
+                            [
+                                'Max Overpressure:',
+                                dcc.Input(
+                                    id="vent_target_pressure",
+                                    type="number",
+                                    debounce=True,
+                                    min=0,
+                                    placeholder="Pressure (psi)",
+                                    className="control_label"
+                                ),
+                            ],
+                            className="control_label"
+                        ),
+                        html.P(
+                            id="vent_min_area",
+                            className="control_label"
+                        ),
                     ],
                     className="pretty_container row",
                     style={
@@ -131,6 +162,13 @@ layout = html.Div(
             [
                 html.Div(id='selected_experiment', style={'display': 'none'}),
                 html.Div(id='gas_composition', style={'display': 'none'}),
+                dcc.Store(id='vent_session', storage_type='session'),
+                dcc.Store(id='explosion_job'),
+                dcc.Interval(id='explosion_poll', interval=POLL_INTERVAL,
+                             disabled=True),
+                dcc.Store(id='vent_area_job'),
+                dcc.Interval(id='vent_area_poll', interval=POLL_INTERVAL,
+                             disabled=True),
                 html.Div(
                     [
                         dcc.Graph(id='composition_plot')
@@ -156,67 +194,186 @@ layout = html.Div(
 )
 
 
+def _explosion_inputs(gases, radius, area, drag):
+    """ Make explosion model inputs from the page inputs. """
+    fuel_species = _get_fuel_species(gases)
+
+    # Gas properties
+    gas = Inputs(
+        air=AIR_SPECIES,
+        fuel=fuel_species,
+        phi=1.0,  # Composition
+        f=1.0,
+        P=Patm,  # Initial Pressure
+        T=298,  # Initial unburned gas temperature (K)
+        S=None  # Laminar flame speed from the flame speed table
+    )
+
+    # Room and Vent geometry
+    geom = Inputs(
+        R=radius,
+        Cd=drag,
+        Av=area
+    )
+
+    # Control inputs
+    cntrl = Inputs(
+        tmax=0.35  # Max Time for analysis
+    )
+
+    return gas, geom, cntrl
+
+
 @app.callback(
-    Output("explosion_plot", "figure"),
+    [
+        Output("explosion_job", "data"),
+        Output("vent_session", "data"),
+    ],
     [
         Input("gas_composition", "children"),
         Input("vent_room_rad", "value"),
         Input("vent_area", "value"),
         Input("vent_drag", "value"),
     ],
+    [State("vent_session", "data")],
 )
-def make_explosion_figure(gases, radius, area, drag):
-    """ Create explosion plot. """
+def submit_explosion(gases, radius, area, drag, session):
+    """ Start the explosion simulation of the inputs in the background. """
     gases = json.loads(gases) if gases else {}
-    data = []
+    session = session or uuid.uuid4().hex
 
-    if gases and radius and area and drag:
+    if not (gases and radius and area and drag):
+        jobs.cancel(session)
+        return None, session
 
-        fuel_species = _get_fuel_species(gases)
+    gas, geom, cntrl = _explosion_inputs(gases, radius, area, drag)
+    key = explosions.explosion_key(gas, geom, cntrl, PLOT_POINTS)
+    result = explosions.get_result(key)
+    if result is not None:
+        return jobs.finish(session, result), session
 
-        # Gas properties
-        gas = Inputs(
-            air=AIR_SPECIES,
-            fuel=fuel_species,
-            phi=1.0,  # Composition
-            f=1.0,
-            P=Patm,  # Initial Pressure
-            T=298,  # Initial unburned gas temperature (K)
-            S=0.45
-        )
+    job = jobs.submit(session, explosions.explosion_job, key, gas, geom,
+                      cntrl, PLOT_POINTS)
+    return job, session
 
-        # Room and Vent geometry
-        geom = Inputs(
-            R=radius,
-            Cd=area,
-            Av=drag
-        )
 
-        # Control inputs
-        cntrl = Inputs(
-            tmax=0.35  # Max Time for analysis
-        )
+@app.callback(
+    [
+        Output("explosion_plot", "figure"),
+        Output("explosion_poll", "disabled"),
+    ],
+    [
+        Input("explosion_job", "data"),
+        Input("explosion_poll", "n_intervals"),
+    ],
+)
+def make_explosion_figure(job, n_intervals):
+    """ Create explosion plot with the results of the simulation so far. """
+    state = jobs.poll(job)
+    data = []
+    title = "Pressure vs. Time"
+    running = state is not None and state["status"] in (jobs.QUEUED,
+                                                        jobs.RUNNING)
+    result = state["result"] if state else None
 
-        explosion = Explosion(gas=gas, geom=geom, cntrl=cntrl)
-        explosion.run()
+    if running:
+        title += " (solving"
+        if result:
+            title += f" {result['progress']:.0%}"
+        title += "...)"
+    elif state is not None and state["status"] == jobs.ERROR:
+        title += f" (simulation failed: {state['error']})"
 
+    if result:
         data = [
             dict(
-                type="scatter",
+                type="scattergl",
                 mode="lines",
-                x=explosion.t,
-                y=explosion.P_,
+                x=result["t"],
+                y=result["P_"],
                 name="Explosion Pressure vs. Time",
                 opacity=1,
                 hoverinfo="skip",
             )
         ]
 
+        if result["S_fallback"]:
+            title += f" (default flame speed {result['Su']} m/s)"
+
     layout = copy.deepcopy(plot_layout)
-    layout["title"] = "Pressure vs. Time"
+    layout["title"] = title
     layout["showlegend"] = False
     layout["xaxis"] = {"title": {"text": "time (s)"}}
     layout["yaxis"] = {"title": {"text": "Pressure"}}
 
     figure = dict(data=data, layout=layout)
-    return figure
+    return figure, not running
+
+
+def _area_session(session):
+    """ Job session of the vent area search, apart from the explosion. """
+    return session + ':area'
+
+
+@app.callback(
+    Output("vent_area_job", "data"),
+    [
+        Input("gas_composition", "children"),
+        Input("vent_room_rad", "value"),
+        Input("vent_drag", "value"),
+        Input("vent_target_pressure", "value"),
+    ],
+    [
+        State("vent_area", "value"),
+        State("vent_session", "data"),
+    ],
+)
+def submit_min_vent_area(gases, radius, drag, target, area, session):
+    """ Start the search of the minimum vent area in the background.
+
+    The search does not depend on the entered vent area, which is only its
+    initial guess, so editing it does not start a new search.
+    """
+    if not session:
+        # Set by the explosion callback when the page loads
+        raise PreventUpdate
+    gases = json.loads(gases) if gases else {}
+
+    # A target of 0 or less is reported by `update_min_vent_area`
+    if not (gases and radius and drag and target and target > 0):
+        jobs.cancel(_area_session(session))
+        return None
+
+    # The entered vent area is only the initial guess
+    gas, geom, cntrl = _explosion_inputs(gases, radius, area or 0.1, drag)
+    return jobs.submit(_area_session(session), explosions.min_area_job, gas,
+                       geom, cntrl, target)
+
+
+@app.callback(
+    [
+        Output("vent_min_area", "children"),
+        Output("vent_area_poll", "disabled"),
+    ],
+    [
+        Input("vent_area_job", "data"),
+        Input("vent_area_poll", "n_intervals"),
+    ],
+    [State("vent_target_pressure", "value")],
+)
+def update_min_vent_area(job, n_intervals, target):
+    """ Show the minimum vent area for the max overpressure. """
+    if target is not None and target <= 0:
+        return 'The max overpressure must be positive', True
+    state = jobs.poll(job)
+    if state is None:
+        return '', True
+    if state["status"] in (jobs.QUEUED, jobs.RUNNING):
+        return 'Finding the minimum vent area...', False
+    if state["status"] == jobs.ERROR:
+        return f'Vent area search failed: {state["error"]}', True
+
+    min_area = state["result"]
+    if min_area is None:
+        return f'No vent area keeps the overpressure below {target} psi', True
+    return f'Minimum vent area for {target} psi: {min_area:.4f} m^2', True
@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""
+Storage backends of the database API.
+
+`MongoBackend` reads the remote MongoDB database. `LocalBackend` keeps the
+same collections in a local SQLite file and evaluates the subset of the
+MongoDB query language used by the apps: equality, `$and`, `$or`, `$gt`,
+`$gte`, `$lt`, `$lte`, `$ne`, `$in` and `$exists` on dotted field names,
+inclusion or exclusion projections and `distinct`. It is meant for
+read-mostly deployments, tests and benchmarks without network access.
+"""
+
+import copy
+import json
+import os
+import pickle
+import sqlite3
+import threading
+
+# Source data of the local database
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'scripts')
+MAIN_DATA = os.path.join(SCRIPTS_DIR, 'data.csv')
+
+# Memoized query results per collection
+MAX_RESULTS = 256
+
+# Last column before the gas species columns of the main data
+GASES_AFTER = 'Notes'
+
+
+class Backend():
+    """ Interface of the storage backends. """
+
+    def find(self, collection, search=None, projection=None):
+        """ Find the documents of a collection matching a search. """
+        raise NotImplementedError
+
+    def distinct(self, collection, field, search=None):
+        """ Unique values of a field in the documents matching a search. """
+        raise NotImplementedError
+
+    def insert_many(self, collection, documents):
+        """ Insert or replace documents of a collection. """
+        raise NotImplementedError
+
+    def upsert_many(self, collection, documents):
+        """ Replace documents of a collection by `_id`, insert new ones.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """ Release the resources of the backend. """
+
+
+class MongoBackend(Backend):
+    """ Backend of a MongoDB database.
+
+    Parameters
+    ----------
+    get_client : Callable
+        Returns the `MongoClient` to use.
+    db_name : Unicode
+        Name of the database.
+    """
+
+    def __init__(self, get_client, db_name):
+        self.get_client = get_client
+        self.db_name = db_name
+
+    def _collection(self, collection):
+        return self.get_client()[self.db_name][collection]
+
+    def find(self, collection, search=None, projection=None):
+        return self._collection(collection).find(search or {}, projection)
+
+    def distinct(self, collection, field, search=None):
+        return self._collection(collection).find(search or {}).distinct(field)
+
+    def insert_many(self, collection, documents):
+        self._collection(collection).insert_many(list(documents))
+
+    def upsert_many(self, collection, documents):
+        from pymongo import ReplaceOne
+
+        requests = [ReplaceOne({'_id': document['_id']}, document,
+                               upsert=True) for document in documents]
+        if requests:
+            self._collection(collection).bulk_write(requests, ordered=False)
+
+
+class LocalBackend(Backend):
+    """ Backend of a local SQLite file.
+
+    Documents are stored pickled. Collections are read into memory once per
+    process, except for lookups by `_id` which read a single document, and
+    the results of repeated queries are memoized until the next write.
+    Results are returned as copies.
+
+    Parameters
+    ----------
+    path : Unicode
+        Database file. A missing file is created and loaded with
+        `load_local_data`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._collections = {}
+        self._results = {}
+
+        if not os.path.exists(path):
+            load_local_data(self)
+
+    def _connect(self):
+        # Connections must not be shared with forked processes
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)),
+                        exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30,
+                                         isolation_level=None,
+                                         check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS documents (collection TEXT, '
+                'id TEXT, document BLOB, PRIMARY KEY (collection, id))')
+            self._pid = os.getpid()
+        return self._conn
+
+    def _documents(self, collection):
+        """ All documents of a collection, cached in memory. """
+        with self._lock:
+            if collection not in self._collections:
+                rows = self._connect().execute(
+                    'SELECT document FROM documents WHERE collection = ? '
+                    'ORDER BY rowid', (collection,)).fetchall()
+                self._collections[collection] = [_loads(row[0])
+                                                 for row in rows]
+            return self._collections[collection]
+
+    def _by_id(self, collection, id):
+        """ Documents of a collection with a given `_id`. """
+        with self._lock:
+            rows = self._connect().execute(
+                'SELECT document FROM documents WHERE collection = ? '
+                'AND id = ?', (collection, json.dumps(id))).fetchall()
+        return [_loads(row[0]) for row in rows]
+
+    def _search(self, collection, search):
+        search = search or {}
+        if list(search) == ['_id'] and not isinstance(search['_id'], dict):
+            return self._by_id(collection, search['_id'])
+        return [document for document in self._documents(collection)
+                if matches(document, search)]
+
+    def _memoized(self, collection, query, compute):
+        """ Result of a query, computed once until the next write. """
+        key = json.dumps(query, sort_keys=True, default=str)
+        with self._lock:
+            results = self._results.setdefault(collection, {})
+            if key in results:
+                return results[key]
+        result = compute()
+        with self._lock:
+            results = self._results.setdefault(collection, {})
+            if len(results) >= MAX_RESULTS:
+                results.clear()
+            results[key] = result
+        return result
+
+    def find(self, collection, search=None, projection=None):
+        documents = self._memoized(
+            collection, ['find', search, projection],
+            lambda: [project(document, projection)
+                     for document in self._search(collection, search)])
+        # Callers may modify the results, never the memoized documents
+        return copy.deepcopy(documents)
+
+    def distinct(self, collection, field, search=None):
+        def compute():
+            values = []
+            for document in self._search(collection, search):
+                value = get_field(document, field)
+                for item in value if isinstance(value, list) else [value]:
+                    if item is not None and item not in values:
+                        values.append(item)
+            return values
+
+        return copy.deepcopy(self._memoized(
+            collection, ['distinct', field, search], compute))
+
+    def insert_many(self, collection, documents):
+        rows = [(collection, json.dumps(document['_id']),
+                 sqlite3.Binary(pickle.dumps(
+                     document, protocol=pickle.HIGHEST_PROTOCOL)))
+                for document in documents]
+        with self._lock:
+            conn = self._connect()
+            conn.execute('BEGIN')
+            conn.executemany('INSERT OR REPLACE INTO documents '
+                             'VALUES (?, ?, ?)', rows)
+            conn.execute('COMMIT')
+            self._collections.pop(collection, None)
+            self._results.pop(collection, None)
+
+    def upsert_many(self, collection, documents):
+        self.insert_many(collection, documents)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._collections.clear()
+            self._results.clear()
+
+
+def _loads(document):
+    """ Load a stored document, JSON in files of older versions. """
+    if isinstance(document, str):
+        return json.loads(document)
+    return pickle.loads(document)
+
+
+def get_field(document, field):
+    """ Value of a dotted field of a document, None if missing. """
+    value = document
+    for name in field.split('.'):
+        if not isinstance(value, dict) or name not in value:
+            return None
+        value = value[name]
+    return value
+
+
+def matches(document, search):
+    """ Whether a document matches a MongoDB search. """
+    for key, condition in search.items():
+        if key == '$and':
+            if not all(matches(document, item) for item in condition):
+                return False
+        elif key == '$or':
+            if not any(matches(document, item) for item in condition):
+                return False
+        elif not _matches_value(get_field(document, key), condition):
+            return False
+    return True
+
+
+def _matches_value(value, condition):
+    """ Whether a field value matches a condition. """
+    if not (isinstance(condition, dict) and condition and
+            all(key.startswith('$') for key in condition)):
+        return _equals(value, condition)
+
+    for operator, operand in condition.items():
+        if operator == '$eq':
+            ok = _equals(value, operand)
+        elif operator == '$ne':
+            ok = not _equals(value, operand)
+        elif operator == '$in':
+            ok = any(_equals(value, item) for item in operand)
+        elif operator == '$exists':
+            ok = (value is not None) == bool(operand)
+        elif operator in _COMPARISONS:
+            ok = _compare(value, operand, _COMPARISONS[operator])
+        else:
+            raise ValueError(f'Unsupported query operator: {operator}')
+        if not ok:
+            return False
+    return True
+
+
+_COMPARISONS = {
+    '$gt': lambda a, b: a > b,
+    '$gte': lambda a, b: a >= b,
+    '$lt': lambda a, b: a < b,
+    '$lte': lambda a, b: a <= b,
+}
+
+
+def _equals(value, operand):
+    if isinstance(value, list) and not isinstance(operand, list):
+        return operand in value
+    return value == operand
+
+
+def _compare(value, operand, compare):
+    # Values of different types never match, like in MongoDB
+    numbers = (int, float)
+    if isinstance(value, bool) or value is None:
+        return False
+    if isinstance(value, numbers) and isinstance(operand, numbers):
+        return compare(value, operand)
+    if isinstance(value, str) and isinstance(operand, str):
+        return compare(value, operand)
+    return False
+
+
+def project(document, projection):
+    """ Apply a MongoDB inclusion or exclusion projection to a document. """
+    if not projection:
+        return dict(document)
+
+    fields = {key: value for key, value in projection.items()
+              if key != '_id'}
+    include_id = projection.get('_id', 1)
+
+    if any(fields.values()):
+        result = {}
+        if include_id and '_id' in document:
+            result['_id'] = document['_id']
+        for field in fields:
+            value = get_field(document, field)
+            if value is not None or _has_field(document, field):
+                _set_field(result, field, value)
+        return result
+
+    result = copy.deepcopy(document)
+    for field in fields:
+        _pop_field(result, field)
+    if not include_id:
+        result.pop('_id', None)
+    return result
+
+
+def _has_field(document, field):
+    *parents, name = field.split('.')
+    value = get_field(document, '.'.join(parents)) if parents else document
+    return isinstance(value, dict) and name in value
+
+
+def _set_field(document, field, value):
+    *parents, name = field.split('.')
+    for parent in parents:
+        document = document.setdefault(parent, {})
+    document[name] = value
+
+
+def _pop_field(document, field):
+    *parents, name = field.split('.')
+    for parent in parents:
+        document = document.get(parent)
+        if not isinstance(document, dict):
+            return
+    document.pop(name, None)
+
+
+def load_local_data(backend, main=MAIN_DATA):
+    """ Load the bundled experiment data into a backend.
+
+    Only the `main` collection is loaded. The example maps of
+    `scripts/example_data` belong to no experiment of the data, the
+    flammability maps of the experiments are computed with `db.ingest`.
+
+    Parameters
+    ----------
+    backend : Backend
+        Backend to load.
+    main : Unicode
+        CSV file of the experiments, read with `ingest.read_experiments`.
+    """
+    from .ingest import read_experiments
+
+    backend.insert_many('main', read_experiments(main))
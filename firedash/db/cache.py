@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Caches of the database reads of the dashboard, shared by all processes of a
+host.
+
+Writers of the database call `invalidate` after a write. It clears the
+shared caches and records the time of the write, so the processes also drop
+what they derived from the data in memory.
+"""
+
+import os
+import time
+
+from scripts.cache import DiskCache
+
+# Max number of figures in the on-disk cache
+FIGURE_CACHE_SIZE = int(os.environ.get('FIREDASH_FIGURE_CACHE_SIZE', 500))
+
+# Database reads
+reads = DiskCache('db')
+# Figures computed from the database, the oldest are dropped beyond
+# `FIGURE_CACHE_SIZE`
+figures = DiskCache('figures', maxsize=FIGURE_CACHE_SIZE)
+
+# Key of the time of the last invalidation, in `reads`
+GENERATION_KEY = 'generation'
+
+
+def generation():
+    """ Time of the last `invalidate` by any process, 0 if never. """
+    return reads.get(GENERATION_KEY, 0)
+
+
+def invalidate():
+    """ Drop all cached database reads and figures, after a data update. """
+    reads.clear()
+    figures.clear()
+    reads.set(GENERATION_KEY, time.time())
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Gas species and experiment ids shared by the dashboard, the ingestion and
+the flame speed table.
+"""
+
+# Gases of the Cantera mechanism, the others are lumped as propane
+CANTERA_GASES = ['CO2', 'CO', 'H2', 'CH4', 'C2H4', 'C2H6', 'C3H8', 'N2', 'O2',
+                 'CH3OH']
+# Gases that do not burn, a fuel of only these has no flammability map
+INERT_GASES = ['CO2', 'N2', 'O2']
+
+# Gases of the experiments listed by the dashboard, one of them is present
+SEARCH_GASES = ['CO2', 'H2', 'CH4', 'C3H8']
+
+# Fields identifying an experiment of the dashboard
+EXPERIMENT_FIELDS = ['Publication', 'Chemistry', 'SOC']
+
+
+def fuel_species(gases):
+    """ Make all non-Cantera gases Propane (C3H8). """
+    species = {}
+    for gas, quantity in gases.items():
+        name = gas if gas in CANTERA_GASES else 'C3H8'
+        species[name] = species.get(name, 0) + quantity
+    return species
+
+
+def slug(value):
+    """ Lower case value without commas, words joined by dashes. """
+    value = str(value).lower().replace(',', '')
+    return '-'.join(value.split())
+
+
+def experiment_id(experiment):
+    """ Id of the flammability document of an experiment. """
+    return '-'.join(slug(experiment[field]) for field in EXPERIMENT_FIELDS)
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""
+Ingest the literature vent gas data into the `main` and `flammability`
+collections.
+
+    python -m db.ingest [data.csv] [--processes N] [--dry-run]
+
+The CSV file is read row by row. Every row becomes a `main` document, and
+the flammability map of its fuel is computed in a process pool and written
+with its summary metrics under the experiment id the dashboard looks up.
+Documents carry a hash of their source data, so running the ingestion again
+only writes new or changed rows and only computes new or changed maps.
+
+Rows already in the `main` collection are matched on their `ROW_FIELDS`
+and keep their `_id`. The map of an experiment is computed from the gases
+the dashboard shows for it, those of its last row. The maps have the columns
+of `doAnalysis` (Xf, Xa, Xi, phi, Tad and Flammable) and no laminar flame
+speed (Su) or adiabatic pressure (Pmax) columns, so maps written before the
+ingestion, without a source hash, are kept as they are.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import csv
+import math
+
+from scripts.cache import make_key
+
+from .api import get_backend
+from .backends import GASES_AFTER, MAIN_DATA
+from .cache import invalidate
+from .flammability import write_documents
+from .ids import (INERT_GASES, SEARCH_GASES, experiment_id, fuel_species,
+                  slug)
+
+# Fields identifying a row
+ROW_FIELDS = ['Publication', 'Format', 'Chemistry', 'Electrolyte', 'SOC']
+# Fields kept as text, e.g. SOC is '100' or 'Varied'
+TEXT_FIELDS = ['Author', 'Publication', 'Format', 'Chemistry', 'Electrolyte',
+               'SOC', 'Failure', 'Notes']
+
+# Version of the flammability maps, changing it recomputes all of them
+MAP_VERSION = 1
+
+# Documents written per request
+BATCH_SIZE = 20
+
+
+def _parse(text, default):
+    """ Number or text of a CSV cell, `default` if empty. """
+    if text == '':
+        return default
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+    if math.isnan(number):
+        return default
+    return int(number) if number.is_integer() else number
+
+
+def row_key(document):
+    """ Key of a `main` document made from its `ROW_FIELDS`. """
+    values = []
+    for field in ROW_FIELDS:
+        value = document.get(field, '')
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        values.append(slug(value))
+    return '-'.join(values)
+
+
+def _numbered(key, counts):
+    """ Number the rows with the same key in order. """
+    counts[key] += 1
+    return key if counts[key] == 1 else f'{key}-{counts[key]}'
+
+
+def read_experiments(filename=MAIN_DATA):
+    """ Read the `main` documents of a CSV file of experiments, one by one.
+
+    Parameters
+    ----------
+    filename : Unicode
+        CSV file, one row per experiment with the gas species columns after
+        the 'Notes' column.
+
+    Yields
+    ------
+    Dict
+        Document of a row, with the gases in 'Gases' and the hash of its
+        data in 'source_hash'. The `_id` is made from the `ROW_FIELDS`.
+    """
+    counts = collections.Counter()
+    with open(filename, newline='', encoding='utf-8-sig') as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        gases = header[header.index(GASES_AFTER) + 1:]
+
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            values = dict(zip(header, row))
+            document = {}
+            for key in header:
+                if key in TEXT_FIELDS:
+                    document[key] = values.get(key, '')
+                elif key not in gases:
+                    document[key] = _parse(values.get(key, ''), '')
+            if not document['Publication']:
+                document['Publication'] = '{Author} {Year}'.format(
+                    **document)
+            document['Gases'] = {}
+            for gas in gases:
+                value = _parse(values.get(gas, ''), 0)
+                document['Gases'][gas] = value if not isinstance(
+                    value, str) else 0
+            document['source_hash'] = make_key(document)
+
+            # Rows with the same fields are numbered in order
+            document['_id'] = _numbered(row_key(document), counts)
+            yield document
+
+
+def is_listed(document):
+    """ Whether the dashboard lists a `main` document, see
+    `apps.util._add_search_filter`.
+    """
+    return any(isinstance(document['Gases'].get(gas), (int, float)) and
+               document['Gases'][gas] > 0 for gas in SEARCH_GASES)
+
+
+def displayed_gases(documents):
+    """ Gases the dashboard shows for the listed `main` documents of an
+    experiment, the last of their distinct values like
+    `apps.callbacks.update_gases`.
+    """
+    values = []
+    for document in documents:
+        if document['Gases'] not in values:
+            values.append(document['Gases'])
+    return values[-1] if values else None
+
+
+def flammability_fuel(gases):
+    """ Fuel of the flammability map of the gases of an experiment.
+
+    Returns
+    -------
+    Dict
+        Fuel composition, None if the gases do not burn.
+    """
+    fuel = {gas: quantity for gas, quantity in
+            fuel_species(gases).items() if quantity > 0}
+    if not any(gas not in INERT_GASES for gas in fuel):
+        return None
+    return fuel
+
+
+def map_source(fuel):
+    """ Hash of the inputs of a flammability map. """
+    from scripts.equilibrium import normalize_composition
+
+    return make_key('flammability', MAP_VERSION,
+                    normalize_composition(fuel))
+
+
+def _flammability_map(id, fuel, source, store_path):
+    """ Compute the flammability document of a fuel in a worker process.
+
+    The document has the `doAnalysis` columns only, without Su or Pmax.
+    """
+    from scripts.checkpoint import CheckpointStore
+    from scripts.flammability_limits import doAnalysis
+
+    store = CheckpointStore(store_path) if store_path else None
+    df = doAnalysis(fuel, processes=1, store=store)
+    document = {column: df[column].values for column in df.columns}
+    document.update({'_id': id, 'fuel': fuel, 'source_hash': source})
+    return document
+
+
+def ingest(backend, filename=MAIN_DATA, processes=None,
+           batch_size=BATCH_SIZE, dry_run=False, store_path=None):
+    """ Ingest a CSV file of experiments into a backend.
+
+    Parameters
+    ----------
+    backend : Backend
+        Storage backend.
+    filename : Unicode
+        CSV file of the experiments.
+    processes : Int
+        Number of worker processes of the maps, all cores by default.
+    batch_size : Int
+        Number of documents written per request.
+    dry_run : Bool
+        Only report what would be written and computed.
+    store_path : Unicode
+        File of a `CheckpointStore` of the map rows, so an interrupted
+        ingestion does not compute them again.
+
+    Returns
+    -------
+    Dict
+        Number of rows read and written, of maps computed, unchanged, kept
+        (written before the ingestion) and failed.
+    """
+    stats = dict.fromkeys(['rows', 'rows_written', 'maps_computed',
+                           'maps_unchanged', 'maps_kept', 'maps_failed'], 0)
+
+    # Existing rows by key, in the order they would have been read
+    rows = {}
+    counts = collections.Counter()
+    projection = dict.fromkeys(ROW_FIELDS + ['source_hash'], 1)
+    for document in backend.find('main', projection=projection):
+        rows[_numbered(row_key(document), counts)] = document
+    maps = {document['_id']: document.get('source_hash')
+            for document in backend.find(
+                'flammability', projection={'source_hash': 1})}
+
+    experiments = collections.OrderedDict()
+    batch = []
+    for document in read_experiments(filename):
+        stats['rows'] += 1
+        existing = rows.get(document['_id'])
+        if existing is not None:
+            document['_id'] = existing['_id']
+        if existing is None or (existing.get('source_hash') !=
+                                document['source_hash']):
+            stats['rows_written'] += 1
+            batch.append(document)
+            if len(batch) >= batch_size:
+                if not dry_run:
+                    backend.upsert_many('main', batch)
+                batch = []
+        if is_listed(document):
+            experiments.setdefault(experiment_id(document), []).append(
+                document)
+    if batch and not dry_run:
+        backend.upsert_many('main', batch)
+
+    sources = {}
+    for id, documents in experiments.items():
+        fuel = flammability_fuel(displayed_gases(documents))
+        if fuel is None:
+            continue
+        source = map_source(fuel)
+        if id in maps and maps[id] is None:
+            stats['maps_kept'] += 1
+        elif maps.get(id) == source:
+            stats['maps_unchanged'] += 1
+        else:
+            sources[id] = (fuel, source)
+
+    if dry_run:
+        stats['maps_computed'] = len(sources)
+        return stats
+    if stats['rows_written']:
+        invalidate()
+    if not sources:
+        return stats
+
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=processes)
+    futures = {pool.submit(_flammability_map, id, fuel, source,
+                           store_path): id
+               for id, (fuel, source) in sources.items()}
+    batch = []
+    try:
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                batch.append(future.result())
+            except Exception as error:
+                stats['maps_failed'] += 1
+                print(f'Flammability map of {futures[future]} failed: '
+                      f'{error}')
+                continue
+            stats['maps_computed'] += 1
+            if len(batch) >= batch_size:
+                write_documents(backend, batch)
+                batch = []
+        if batch:
+            write_documents(backend, batch)
+    finally:
+        for future in futures:
+            future.cancel()
+        pool.shutdown()
+        if stats['maps_computed']:
+            invalidate()
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('filename', nargs='?', default=MAIN_DATA,
+                        help='CSV file of the experiments')
+    parser.add_argument('--processes', type=int,
+                        help='worker processes of the maps, all cores by '
+                             'default')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='only report what would be written')
+    parser.add_argument('--store',
+                        help='checkpoint file of the map computations')
+    args = parser.parse_args()
+
+    stats = ingest(get_backend(), args.filename, processes=args.processes,
+                   dry_run=args.dry_run, store_path=args.store)
+    print(f"{stats['rows_written']} of {stats['rows']} rows written, "
+          f"{stats['maps_computed']} maps computed, "
+          f"{stats['maps_unchanged']} unchanged, "
+          f"{stats['maps_kept']} kept, "
+          f"{stats['maps_failed']} failed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Convert the flammability documents to the binary format, with their
+summary metrics.
+
+    python -m db.migrate [--dry-run] [--compress]
+"""
+
+import argparse
+
+import bson
+
+from .api import get_backend
+from .cache import invalidate
+from .flammability import encode_document, is_encoded
+
+# Documents written per request
+BATCH_SIZE = 20
+
+
+def migrate(backend, collection='flammability', compress=False,
+            dry_run=False, batch_size=BATCH_SIZE):
+    """ Convert the documents of a collection to the binary format.
+
+    Documents already in the binary format with summary metrics are left as
+    they are, so the migration can be run again after an interruption.
+
+    Parameters
+    ----------
+    backend : Backend
+        Storage backend.
+    collection : Unicode
+        Name of the flammability collection.
+    compress : Bool
+        Compress the columns with zlib.
+    dry_run : Bool
+        Only report what would be converted.
+    batch_size : Int
+        Number of documents written per request.
+
+    Returns
+    -------
+    Dict
+        Number of documents seen and converted, and their BSON sizes
+        (bytes) before and after the conversion.
+    """
+    stats = {'documents': 0, 'converted': 0, 'size_before': 0,
+             'size_after': 0}
+    batch = []
+
+    for document in backend.find(collection):
+        stats['documents'] += 1
+        if is_encoded(document) and 'summary' in document:
+            continue
+
+        encoded = encode_document(document, compress=compress)
+        stats['converted'] += 1
+        stats['size_before'] += len(bson.BSON.encode(document))
+        stats['size_after'] += len(bson.BSON.encode(encoded))
+
+        batch.append(encoded)
+        if len(batch) >= batch_size:
+            if not dry_run:
+                backend.upsert_many(collection, batch)
+            batch = []
+
+    if batch and not dry_run:
+        backend.upsert_many(collection, batch)
+    if stats['converted'] and not dry_run:
+        invalidate()
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--collection', default='flammability',
+                        help='name of the flammability collection')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='only report what would be converted')
+    parser.add_argument('--compress', action='store_true',
+                        help='compress the columns with zlib')
+    args = parser.parse_args()
+
+    stats = migrate(get_backend(), args.collection,
+                    compress=args.compress, dry_run=args.dry_run)
+    print(f"{stats['converted']} of {stats['documents']} documents converted,"
+          f" {stats['size_before']} -> {stats['size_after']} bytes")
+
+
+if __name__ == '__main__':
+    main()
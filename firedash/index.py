@@ -1,11 +1,17 @@
 # -*- coding: utf-8 -*-
+import os
+
 import dash_core_components as dcc
 import dash_html_components as html
+import flask
 from dash.dependencies import Input, Output
 
 from app import app
-from apps import hazard_analysis, vent_calculator
+from apps import explosions, hazard_analysis, util, vent_calculator
+from db.api import pool_stats
 
+# Serve `/stats`, off unless `FIREDASH_STATS` is 1
+STATS_ENABLED = os.environ.get('FIREDASH_STATS') == '1'
 
 app.layout = html.Div([
     dcc.Location(id='url', refresh=False),
@@ -24,5 +30,18 @@ def display_page(pathname):
         return html.Div([html.H3('404')])
 
 
+@app.server.route('/stats')
+def stats():
+    """ Cache and connection pool statistics, as JSON. The explosion
+    cache is counted over all workers, the others for this worker. Not
+    found unless `STATS_ENABLED`.
+    """
+    if not STATS_ENABLED:
+        flask.abort(404)
+    return flask.jsonify(explosions=explosions.cache_stats(),
+                         database=util.cache_stats(),
+                         pool=pool_stats())
+
+
 if __name__ == '__main__':
     app.run_server(debug=True)
@@ -33,7 +33,7 @@ gas = Inputs(
     f=1.0,
     P=Patm,  # Initial Pressure
     T=298,  # Initial unburned gas temperature K
-    S=0.45
+    S=None  # Laminar flame speed (m/s), None to look it up
 )
 
 # Room Geometry Inputs
@@ -51,7 +51,7 @@ cntrl = Inputs(
 
 gas.fuel = fuel_species
 r = Explosion(gas=gas, geom=geom, cntrl=cntrl)
-r.run()
+r.run(solver='adaptive', stop='settled')
 fuel_conc = 1 - sum(r.gas_u['N2', 'O2'].X)
-print(r.P_.max(), r.Pf_, r.Tb, fuel_conc)
+print(r.P_.max(), r.Pf_, r.Tb, r.Su, r.S_fallback, fuel_conc)
 P = psi(np.nanmax(r.P_))
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Caches shared by the scripts and the dashboard.
+
+`LRUCache` is a bounded in-memory cache for a single process, `DiskCache`
+persists values in a SQLite file that all processes on a host can share and
+`Counters` keeps statistics in such a file.
+"""
+
+import collections
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+
+def cache_dir():
+    """ Directory of the on-disk caches, `FIREDASH_CACHE_DIR` if set. """
+    default = os.path.join(os.path.expanduser('~'), '.cache', 'firedash')
+    return os.environ.get('FIREDASH_CACHE_DIR', default)
+
+
+def connect(path, *statements):
+    """ Open a SQLite database for concurrent use by several processes.
+
+    Parameters
+    ----------
+    path : Unicode
+        Database file, its directory is created if needed.
+    statements : List
+        SQL statements run on the new connection, e.g. to create tables.
+
+    Returns
+    -------
+    sqlite3.Connection
+        Connection in autocommit and write-ahead log mode.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None,
+                           check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    for statement in statements:
+        conn.execute(statement)
+    return conn
+
+
+def make_key(*parts):
+    """ Make a stable cache key from JSON serializable parts. """
+    data = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+class LRUCache():
+    """ Thread-safe, bounded, least recently used cache. """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class DiskCache():
+    """ Persistent key-value cache in a SQLite file.
+
+    Values are pickled. Errors of the underlying file are treated as cache
+    misses so a broken cache never breaks a computation, and values that
+    fail to unpickle are deleted.
+
+    Parameters
+    ----------
+    name : Unicode
+        Name of the cache file, without extension.
+    directory : Unicode
+        Directory of the cache file, `cache_dir()` by default.
+    maxsize : Int
+        Max number of values, the oldest are deleted beyond it. Unbounded if
+        None.
+    """
+
+    def __init__(self, name, directory=None, maxsize=None):
+        self.path = os.path.join(directory or cache_dir(), name + '.sqlite')
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connect(self):
+        # Connections must not be shared with forked processes
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = connect(
+                self.path, 'CREATE TABLE IF NOT EXISTS cache '
+                '(key TEXT PRIMARY KEY, value BLOB, created REAL)')
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key, default=None, ttl=None):
+        """ Get a value, `default` if missing or older than `ttl` seconds. """
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    'SELECT value, created FROM cache WHERE key = ?',
+                    (key,)).fetchone()
+        except (sqlite3.Error, OSError):
+            return default
+
+        if row is None:
+            return default
+        if ttl is not None and time.time() - row[1] > ttl:
+            return default
+        try:
+            return pickle.loads(row[0])
+        except Exception:  # Truncated value or class no longer importable
+            self.delete(key)
+            return default
+
+    def set(self, key, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?)',
+                             (key, sqlite3.Binary(data), time.time()))
+                if self.maxsize is not None:
+                    conn.execute(
+                        'DELETE FROM cache WHERE key IN (SELECT key FROM '
+                        'cache ORDER BY created DESC LIMIT -1 OFFSET ?)',
+                        (self.maxsize,))
+        except (sqlite3.Error, OSError):
+            pass
+
+    def delete(self, key):
+        try:
+            with self._lock:
+                self._connect().execute('DELETE FROM cache WHERE key = ?',
+                                        (key,))
+        except (sqlite3.Error, OSError):
+            pass
+
+    def clear(self):
+        try:
+            with self._lock:
+                self._connect().execute('DELETE FROM cache')
+        except (sqlite3.Error, OSError):
+            pass
+
+    def prune(self, ttl):
+        """ Delete the values older than `ttl` seconds. """
+        try:
+            with self._lock:
+                self._connect().execute('DELETE FROM cache WHERE created < ?',
+                                        (time.time() - ttl,))
+        except (sqlite3.Error, OSError):
+            pass
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        try:
+            with self._lock:
+                return self._connect().execute(
+                    'SELECT COUNT(*) FROM cache').fetchone()[0]
+        except (sqlite3.Error, OSError):
+            return 0
+
+
+class Counters():
+    """ Named counters in a SQLite file, shared by all processes on a host.
+
+    Like `DiskCache`, errors of the underlying file are ignored and read as
+    zero counts.
+
+    Parameters
+    ----------
+    name : Unicode
+        Name of the file, without extension. It can be the file of a
+        `DiskCache`, the counters have their own table.
+    directory : Unicode
+        Directory of the file, `cache_dir()` by default.
+    """
+
+    def __init__(self, name, directory=None):
+        self.path = os.path.join(directory or cache_dir(), name + '.sqlite')
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connect(self):
+        # Connections must not be shared with forked processes
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = connect(
+                self.path, 'CREATE TABLE IF NOT EXISTS counters '
+                '(name TEXT PRIMARY KEY, value REAL)')
+            self._pid = os.getpid()
+        return self._conn
+
+    def add(self, **amounts):
+        """ Add amounts to counters, e.g. `add(hits=1, seconds=0.5)`. """
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    for name, amount in amounts.items():
+                        conn.execute('INSERT OR IGNORE INTO counters '
+                                     'VALUES (?, 0)', (name,))
+                        conn.execute('UPDATE counters SET value = value + ? '
+                                     'WHERE name = ?', (amount, name))
+                    conn.execute('COMMIT')
+                except sqlite3.Error:
+                    conn.execute('ROLLBACK')
+                    raise
+        except (sqlite3.Error, OSError):
+            pass
+
+    def get(self, *names):
+        """ Values of counters by name, 0 for those never added to. """
+        values = dict.fromkeys(names, 0)
+        try:
+            with self._lock:
+                rows = self._connect().execute(
+                    'SELECT name, value FROM counters').fetchall()
+        except (sqlite3.Error, OSError):
+            return values
+        values.update((name, value) for name, value in rows
+                      if name in values)
+        return values
+
+    def clear(self):
+        try:
+            with self._lock:
+                self._connect().execute('DELETE FROM counters')
+        except (sqlite3.Error, OSError):
+            pass
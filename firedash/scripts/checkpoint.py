@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Checkpoints of long running analyses.
+
+Results are written chunk by chunk as soon as they are computed, so a
+killed run loses at most the chunk in progress and a restarted run skips
+everything that is already done. Completed chunks can be read by other
+processes while a run is still writing.
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+
+try:
+    from .cache import connect, make_key
+    from .equilibrium import normalize_composition
+except ImportError:  # Run as a script from the scripts directory
+    from cache import connect, make_key
+    from equilibrium import normalize_composition
+
+
+def run_key(name, composition):
+    """ Make the key of a run of analysis `name` for a gas composition. """
+    return make_key(name, normalize_composition(composition))
+
+
+class CheckpointStore():
+    """ Chunked result store keyed by run and chunk.
+
+    Parameters
+    ----------
+    path : Unicode
+        SQLite file of the store.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connect(self):
+        # Connections must not be shared with forked processes
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = connect(
+                self.path, 'CREATE TABLE IF NOT EXISTS chunks '
+                '(run TEXT, key TEXT, value BLOB, PRIMARY KEY (run, key))')
+            self._pid = os.getpid()
+        return self._conn
+
+    def _execute(self, sql, parameters=()):
+        with self._lock:
+            return self._connect().execute(sql, parameters).fetchall()
+
+    def get(self, run, key, default=None):
+        """ Get a completed chunk, `default` if it is not done. """
+        rows = self._execute(
+            'SELECT value FROM chunks WHERE run = ? AND key = ?', (run, key))
+        return pickle.loads(rows[0][0]) if rows else default
+
+    def put(self, run, key, value):
+        """ Persist a completed chunk. """
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._execute('INSERT OR REPLACE INTO chunks VALUES (?, ?, ?)',
+                      (run, key, sqlite3.Binary(data)))
+
+    def done(self, run, key):
+        """ Whether a chunk is completed. """
+        return bool(self._execute(
+            'SELECT 1 FROM chunks WHERE run = ? AND key = ?', (run, key)))
+
+    def items(self, run):
+        """ All completed (key, value) chunks of a run. """
+        rows = self._execute(
+            'SELECT key, value FROM chunks WHERE run = ?', (run,))
+        return [(key, pickle.loads(value)) for key, value in rows]
+
+    def clear(self, run):
+        """ Drop all chunks of a run. """
+        self._execute('DELETE FROM chunks WHERE run = ?', (run,))
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Shape preserving downsampling of time series for plotting.
+
+`lttb` implements the largest-triangle-three-buckets algorithm: the series
+is split into buckets of consecutive points and the point of each bucket
+forming the largest triangle with the point kept in the previous bucket and
+the mean of the next bucket is kept. The first and last points, and the
+peak of the series, are always kept.
+"""
+
+import numpy as np
+
+
+def lttb(x, y, n):
+    """ Downsample a series with largest-triangle-three-buckets.
+
+    Parameters
+    ----------
+    x : ndarray
+        Sorted x values of the series.
+    y : ndarray
+        y values of the series.
+    n : Int
+        Number of points to keep, at least 3.
+
+    Returns
+    -------
+    Tuple
+        x and y values of the kept points.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    size = len(x)
+    if n >= size or n < 3:
+        return x, y
+
+    # Bucket edges of the points between the first and the last
+    edges = np.linspace(1, size - 1, n - 1).astype(int)
+    keep = np.empty(n, dtype=int)
+    keep[0] = 0
+    keep[-1] = size - 1
+
+    a = 0
+    for i in range(n - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Mean of the next bucket, the last point for the last bucket
+        next_stop = edges[i + 2] if i + 2 < len(edges) else size
+        next_x = x[stop:next_stop].mean()
+        next_y = y[stop:next_stop].mean()
+
+        # Twice the triangle areas, enough to compare them
+        areas = np.abs((x[a] - next_x) * (y[start:stop] - y[a]) -
+                       (x[a] - x[start:stop]) * (next_y - y[a]))
+        a = start + int(np.argmax(areas))
+        keep[i + 1] = a
+
+    # Keep the peak in place of the point of its bucket
+    peak = int(np.nanargmax(y))
+    if peak not in keep:
+        bucket = np.searchsorted(edges, peak, side='right')
+        keep[min(bucket, n - 2)] = peak
+        keep.sort()
+
+    return x[keep], y[keep]
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Memoized chemical equilibrium.
+
+Equilibria are keyed on the normalized composition, temperature, pressure,
+equilibrium mode, mechanism files and Cantera version. Results are kept in
+a bounded in-memory LRU cache and in a bounded on-disk cache shared by all
+processes, so repeated runs with the same gases never reach Cantera.
+"""
+
+import collections
+import os
+
+import cantera as ct
+
+try:
+    from .cache import DiskCache, LRUCache, make_key
+    from .mechanisms import GRAPHITE, GRI30, get_solution
+except ImportError:  # Run as a script from the scripts directory
+    from cache import DiskCache, LRUCache, make_key
+    from mechanisms import GRAPHITE, GRI30, get_solution
+
+# Significant digits of the mole fractions in the cache key
+KEY_DIGITS = 10
+
+# Max number of equilibria in the on-disk cache
+DISK_SIZE = int(os.environ.get('FIREDASH_EQUILIBRIUM_CACHE_SIZE', 10000))
+
+GasState = collections.namedtuple(
+    'GasState', ['T', 'P', 'density', 'cp', 'cv', 'mean_molecular_weight',
+                 'phi', 'X'])
+
+_memory = LRUCache(maxsize=1024)
+_disk = DiskCache('equilibrium', maxsize=DISK_SIZE)
+
+
+def normalize_composition(composition):
+    """ Normalize a composition to sorted (species, mole fraction) pairs.
+
+    Parameters
+    ----------
+    composition : Dict or Unicode
+        Species quantities, e.g. {'H2': 1} or 'CO:0.5, H2:0.5'.
+
+    Returns
+    -------
+    List
+        List of (species, mole fraction) pairs, mole fractions sum to 1.
+    """
+    if isinstance(composition, str):
+        pairs = [item.split(':') for item in composition.split(',')
+                 if item.strip()]
+        composition = {name.strip(): float(value) for name, value in pairs}
+
+    total = sum(composition.values())
+    return sorted((name, float(f'{value / total:.{KEY_DIGITS}g}'))
+                  for name, value in composition.items() if value > 0)
+
+
+def equilibrate(mode, T, P, X=None, phi=None, fuel=None, oxidizer=None,
+                carbon=True, **options):
+    """ Equilibrate a gas mixture.
+
+    The mixture is either given by its mole fractions `X` or by an
+    equivalence ratio `phi` of `fuel` and `oxidizer`.
+
+    Parameters
+    ----------
+    mode : Unicode
+        Equilibrium mode, 'HP' or 'UV'.
+    T : Float
+        Initial temperature (K).
+    P : Float
+        Initial pressure (Pa).
+    X : Dict or Unicode
+        Mole fractions of the mixture.
+    phi : Float
+        Equivalence ratio.
+    fuel : Dict or Unicode
+        Fuel composition.
+    oxidizer : Dict or Unicode
+        Oxidizer composition.
+    carbon : Bool
+        Equilibrate together with a solid graphite phase.
+    options : Dict
+        Options of the Cantera `equilibrate` call, e.g. solver='gibbs'.
+
+    Returns
+    -------
+    Tuple
+        `GasState` of the reactants and of the products.
+    """
+    if X is not None:
+        composition = {'X': normalize_composition(X)}
+    else:
+        composition = {'phi': float(phi),
+                       'fuel': normalize_composition(fuel),
+                       'oxidizer': normalize_composition(oxidizer)}
+    key = make_key(mode, float(T), float(P), composition, carbon, options,
+                   GRI30, GRAPHITE, ct.__version__)
+
+    states = _memory.get(key)
+    if states is None:
+        states = _disk.get(key)
+        if states is None:
+            states = _solve(mode, T, P, composition, carbon, options)
+            _disk.set(key, states)
+        _memory.set(key, states)
+
+    return tuple(GasState(**state) for state in states)
+
+
+def to_solution(state, slot=None):
+    """ Get a registry phase set to a cached `GasState`. """
+    gas = get_solution(slot=slot)
+    gas.TPX = state.T, state.P, state.X
+    return gas
+
+
+def clear():
+    """ Clear the in-memory and the on-disk equilibrium caches. """
+    _memory.clear()
+    _disk.clear()
+
+
+def _solve(mode, T, P, composition, carbon, options):
+    """ Run Cantera, returns the reactant and product states as dicts. """
+    gas = get_solution(slot='equilibrium')
+    if 'X' in composition:
+        gas.TPX = T, P, dict(composition['X'])
+    else:
+        gas.set_equivalence_ratio(composition['phi'],
+                                  dict(composition['fuel']),
+                                  dict(composition['oxidizer']))
+        gas.TP = T, P
+    reactants = _state(gas)
+
+    if carbon:
+        mix = ct.Mixture([(gas, 1.0), (get_solution(GRAPHITE, None), 0.0)])
+        mix.T = T
+        mix.P = P
+        mix.equilibrate(mode, **options)
+    else:
+        gas.equilibrate(mode, **options)
+    products = _state(gas)
+
+    return reactants, products
+
+
+def _state(gas):
+    """ Plain dict of the properties of a phase. """
+    return {
+        'T': gas.T,
+        'P': gas.P,
+        'density': gas.density,
+        'cp': gas.cp,
+        'cv': gas.cv,
+        'mean_molecular_weight': gas.mean_molecular_weight,
+        'phi': gas.get_equivalence_ratio(),
+        'X': {name: float(x) for name, x in zip(gas.species_names, gas.X)
+              if x > 0},
+    }
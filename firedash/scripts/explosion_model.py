@@ -1,11 +1,25 @@
 import numpy as np
-from scipy.integrate import odeint
-import cantera as ct
+from scipy.integrate import LSODA, OdeSolution, odeint
+from scipy.optimize import brentq
+
+try:
+    from .equilibrium import equilibrate, to_solution
+    from .flame_table import flame_speed
+except ImportError:  # Run as a script from the scripts directory
+    from equilibrium import equilibrate, to_solution
+    from flame_table import flame_speed
 
 RR = 8.314
 Patm = 101.3E+3
 Patmpsi = Patm * 0.000145038
 
+# Parts of the time grid between progress reports
+CHUNKS = 20
+
+
+class IntegrationError(RuntimeError):
+    """ The adaptive solver failed before the end of the integration. """
+
 
 def psi(P_):
     return (P_ * Patmpsi - Patmpsi)
@@ -33,11 +47,74 @@ class Explosion():
         else:
             return items
 
-    def run(self):
+    @property
+    def gas_u(self):
+        """ Unburned gas of the last run, as a registry phase. """
+        return to_solution(self.unburned, slot='unburned')
+
+    @property
+    def gas_b(self):
+        """ Burned gas at constant pressure of the last run. """
+        return to_solution(self.burned, slot='burned')
+
+    @property
+    def gas_bv(self):
+        """ Burned gas at constant volume of the last run. """
+        return to_solution(self.burned_uv, slot='burned_uv')
+
+    def thermo(self):
+        """ Thermodynamic states of the gases of this explosion.
+
+        States are served from the equilibrium cache when the same gases
+        were solved before.
+
+        Returns
+        -------
+        Tuple
+            `GasState` of the unburned gas, of the burned gas at constant
+            pressure and of the burned gas at constant volume.
+        """
+        # equilibrate the mixture adiabatically at constant P
+        unburned, burned = equilibrate(
+            'HP', self.T, self.P, phi=self.phi, fuel=self.fuel,
+            oxidizer=self.air, solver='gibbs', max_steps=1000)
+        # equilibrate the gas adiabatically at constant volume
+        _, burned_uv = equilibrate(
+            'UV', self.T, self.P, phi=self.phi, fuel=self.fuel,
+            oxidizer=self.air, carbon=False)
+        return unburned, burned, burned_uv
+
+    def run(self, solver='odeint', stop=None, dense_output=False,
+            thermo=None, threshold=None, progress=None):
+        """ Solve the vented explosion.
+
+        Parameters
+        ----------
+        solver : Unicode
+            'odeint' integrates on a fixed grid of 10000 points up to `tmax`.
+            'adaptive' only keeps the adaptive solver steps, records the
+            physical events in `self.events` and stops at the latest when
+            the pressure returns to ambient.
+        stop : Unicode
+            Adaptive solver only. Name of the event that terminates the
+            integration: 'peak', 'wall', 'ambient' or 'settled' (the peak
+            pressure can no longer change, i.e. the flame has reached the
+            wall and the pressure is decaying).
+        dense_output : Bool
+            Adaptive solver only. Keep a continuous solution in `self.sol`.
+        thermo : Tuple
+            States returned by `thermo()` of an explosion with the same
+            gases, computed here if not given.
+        threshold : Float
+            Adaptive solver only. Stop as soon as P_ exceeds this value,
+            recorded as the 'threshold' event.
+        progress : Callable
+            odeint solver only. Called with the times and the solution so
+            far after each of `CHUNKS` parts of the time grid. The
+            integration stops there, with the results so far, when it
+            returns False.
+        """
         # Gas Mixtures
-        air_species = self.air  # Air
-        fuel_species = self.fuel
-        phi = self.phi  # Composition
         f = self.f
 
         # Temperatures and Pressures
@@ -53,31 +130,24 @@ class Explosion():
         Cd = self.Cd  # Coefficient for vent
         Av = self.Av  # Vent Area (m2)
 
-        S = self.S
+        # Laminar flame speed, from the precomputed table if not given
+        S = getattr(self, 'S', None)
+        self.S_fallback = False
+        if S is None or np.isnan(S):
+            S, self.S_fallback = flame_speed(self.fuel, self.phi, T=T,
+                                             P=Patm)
+        self.Su = S
 
         # Solution Control
         tmax = self.tmax  # Max Time for analysis
 
-        # Create Gases
-        carbon = ct.Solution('graphite.xml')
-        # Calls Gas Properties from Gri-MECH
-        gas_b = ct.Solution('gri30.xml', 'gri30_mix')
-        # Calls Gas Properties from Gri-MECH
-        gas_bv = ct.Solution('gri30.xml', 'gri30_mix')
-        # Calls Gas Properties from Gri-MECH
-        gas_u = ct.Solution('gri30.xml', 'gri30_mix')
-        mix_phases_b = [(gas_b, 1.0), (carbon, 0.0)]  # Burned Mixture
-        mix_phases_u = [(gas_u, 1.0), (carbon, 0.0)]  # Unburned Mixture
-
-        gas_b.set_equivalence_ratio(phi, fuel_species, air_species)
-        gas_bv.set_equivalence_ratio(phi, fuel_species, air_species)
-        gas_u.set_equivalence_ratio(phi, fuel_species, air_species)
-        gas_b.TP = T, Patm
-        gas_bv.TP = T, Patm
-        gas_u.TP = T, Patm
-
-        unburned = ct.Mixture(mix_phases_u)  # noqa
-        burned = ct.Mixture(mix_phases_b)
+        # Thermodynamic states
+        if thermo is None:
+            thermo = self.thermo()
+        unburned, burned, burned_uv = thermo
+        self.unburned = unburned
+        self.burned = burned
+        self.burned_uv = burned_uv
 
         # # Calculate Laminar Flamespeed
         # CalcFlamespeed = False
@@ -107,22 +177,19 @@ class Explosion():
         #          Tu**(A4+A5*(0.42-Xh2)))*np.exp(A6*xh2O))
 
         # Unburned Gas Properties
-        cp_aveu = gas_u.cp
-        cv_aveu = gas_u.cv
-        W_aveu = gas_u.mean_molecular_weight
-        rou = gas_u.density
+        cp_aveu = unburned.cp
+        cv_aveu = unburned.cv
+        W_aveu = unburned.mean_molecular_weight
+        rou = unburned.density
 
         # Burned Gas Properties
         # Chemical Equilibrium
-        # equilibrate the mixture adiabatically at constant P
-        burned.equilibrate('HP', solver='gibbs', max_steps=1000)
-        cp_aveb = gas_b.cp  # Average Cp
-        cv_aveb = gas_b.cv  # Average Cv
-        W_aveb = gas_b.mean_molecular_weight  # Average Molecular wt
-        rob = gas_b.density  # Average density
+        cp_aveb = burned.cp  # Average Cp
+        cv_aveb = burned.cv  # Average Cv
+        W_aveb = burned.mean_molecular_weight  # Average Molecular wt
+        rob = burned.density  # Average density
         Tb = burned.T
-        gas_bv.equilibrate('UV')
-        Pf_ = gas_bv.P / Patm
+        Pf_ = burned_uv.P / Patm
 
         # Ratio of specific heats for unburned gas = Cp/Cvs
         gammaU = cp_aveu / cv_aveu
@@ -153,12 +220,24 @@ class Explosion():
         n3init = 1E-5 * (W_aveu / W_aveb) * (Tb / T1)
         ninit = 1E-5
         init = [P_init, n3init, ninit]
-        t = np.linspace(0, tmax, 10000)
 
         # Solve ODE's
-        x = odeint(vent_gas_explosion, init, t,
-                   args=(P1, R, V1, gammaE, Pf_, gammaU, mi, gas_u, S, rou,
-                         rob, gammaB, Cd, Av, f, T1, Pa))
+        self.engine = ExplosionEngine(P1, R, V1, gammaE, Pf_, gammaU, mi, S,
+                                      rou, rob, gammaB, Cd, Av, f, Pa)
+        if solver == 'odeint':
+            t = np.linspace(0, tmax, 10000)
+            if progress is None:
+                x = odeint(self.engine.rhs, init, t)
+            else:
+                t, x = odeint_chunks(self.engine.rhs, init, t, progress)
+            self.events = {}
+            self.sol = None
+        elif solver == 'adaptive':
+            t, x, self.events, self.sol = integrate_adaptive(
+                self.engine, init, tmax, stop=stop, dense_output=dense_output,
+                threshold=threshold)
+        else:
+            raise ValueError(f'Unknown solver: {solver}')
 
         # Output
         self.P_ = x[:, 0]  # Pressure/initial pressure
@@ -169,71 +248,383 @@ class Explosion():
         self.nu = 1 - self.n  # Ratio of unburned mass/initial mass
         self.mu = mi * self.nu  # Mass of unburned gas
         # Number of unburned moles
-        nmu = self.mu / (gas_u.mean_molecular_weight / 1000)
+        nmu = self.mu / (W_aveu / 1000)
 
         self.Vu = (1 - self.n3) * V1
         self.Tu = self.P_ * Patm * self.Vu / (nmu * RR)
-        self.gas_u = gas_u
-        self.gas_b = gas_b
-        self.gas_bv = gas_bv
         self.Tb = Tb
         self.Pf_ = Pf_
 
 
+# Vent parameters that can be solved for, and whether the peak pressure
+# decreases when the parameter increases
+VENT_PARAMETERS = {'Av': True, 'Cd': True, 'R': False}
+
+# Search bounds of the vent parameters
+VENT_BOUNDS = {'Av': (1E-6, 1E+3), 'Cd': (1E-3, 1.0), 'R': (1E-2, 1E+2)}
+
+
+def solve_vent(gas, geom, cntrl, target_psi, parameter='Av', bounds=None,
+               rtol=1E-3, max_iter=100, progress=None):
+    """ Find the vent parameter that keeps the peak overpressure at a target.
+
+    Solves for the minimum vent area `Av` (or drag coefficient `Cd`), or for
+    the maximum room radius `R`, for which psi(Pmax) stays at or below
+    `target_psi`. The other inputs are taken from `gas`, `geom` and `cntrl`,
+    the thermodynamic states are computed once and every trial integration
+    stops as soon as the target is exceeded.
+
+    Parameters
+    ----------
+    gas, geom, cntrl : Inputs
+        Explosion inputs, the value of `parameter` in `geom` is the initial
+        guess.
+    target_psi : Float
+        Maximum allowed peak overpressure (psi), positive.
+    parameter : Unicode
+        Name of the parameter to solve for, 'Av', 'Cd' or 'R'.
+    bounds : Tuple
+        Search interval, `VENT_BOUNDS` by default.
+    rtol : Float
+        Relative tolerance of the result.
+    max_iter : Int
+        Maximum number of trial integrations.
+    progress : Callable
+        Called with the best value found so far (None before the first
+        safe trial) before every trial integration. The search stops, and
+        returns None, when it returns False.
+
+    Returns
+    -------
+    Float
+        Parameter value, None if the target cannot be met within `bounds`.
+        Trials whose integration fails count as exceeding the target.
+    """
+    if parameter not in VENT_PARAMETERS:
+        raise ValueError(f'Unknown vent parameter: {parameter}')
+    if not target_psi > 0:
+        # The pressure exceeds ambient from the start, the threshold event
+        # of a target of 0 never fires
+        raise ValueError(
+            f'The target overpressure must be positive: {target_psi}')
+    decreasing = VENT_PARAMETERS[parameter]
+    lower, upper = bounds or VENT_BOUNDS[parameter]
+    threshold = target_psi / Patmpsi + 1
+    thermo = Explosion(gas=gas, geom=geom, cntrl=cntrl).thermo()
+
+    class Stopped(Exception):
+        pass
+
+    def is_safe(value):
+        if progress is not None and progress(safe) is False:
+            raise Stopped
+        trial = Inputs(**dict(geom.__dict__, **{parameter: value}))
+        explosion = Explosion(gas=gas, geom=trial, cntrl=cntrl)
+        try:
+            explosion.run(solver='adaptive', stop='settled', thermo=thermo,
+                          threshold=threshold)
+        except IntegrationError:
+            # The peak pressure of a failed trial is unknown
+            return False
+        return not explosion.events['threshold']
+
+    # Bracket the boundary between safe and unsafe values, stepping
+    # towards the unsafe side from a safe value and vice versa
+    step = 2.0 if decreasing else 0.5
+    value = min(max(getattr(geom, parameter), lower), upper)
+    safe = unsafe = None
+    try:
+        for _ in range(max_iter):
+            if is_safe(value):
+                safe, value = value, value / step
+            else:
+                unsafe, value = value, value * step
+            if safe is not None and unsafe is not None:
+                break
+            value = min(max(value, lower), upper)
+            if value in (safe, unsafe):  # Bound reached
+                return safe
+
+        # Bisect
+        for _ in range(max_iter):
+            if abs(safe - unsafe) <= rtol * abs(safe):
+                break
+            middle = 0.5 * (safe + unsafe)
+            if is_safe(middle):
+                safe = middle
+            else:
+                unsafe = middle
+    except Stopped:
+        return None
+    return safe
+
+
+class ExplosionEngine():
+    """ Right-hand side of the vented explosion ODE system.
+
+    Everything that stays constant during a run (choked flow thresholds,
+    vent flow coefficients, exponents of the specific heat ratios, ...) is
+    folded into a coefficient block once, so that `rhs` only does the
+    state-dependent arithmetic.
+    """
+
+    def __init__(self, P1, R, V1, gammaE, Pf_, gammaU, mi, S, rou, rob,
+                 gammaB, Cd, Av, f, Pa):
+        # Flame propagation
+        b = gammaE * Pf_ - 1
+        area = 4 * np.pi / V1
+        St = S * f
+
+        # Choked flow thresholds, compared against Pa / P
+        pcrit_u = (2 / (gammaU + 1)) ** (gammaU / (gammaU - 1))
+        pcrit_b = (2 / (gammaB + 1)) ** (gammaB / (gammaB - 1))
+
+        # Vent mass flow coefficients, ddt_mv_mi = k * sqrt(...)
+        choked_u = Cd * Av * rou / mi * (
+            gammaU / rou * ((1 + gammaU) / 2) ** (
+                (1 + gammaU) / (1 - gammaU))) ** 0.5
+        choked_b = Cd * Av * rob / mi * (
+            gammaB / rob * ((1 + gammaB) / 2) ** (
+                (1 + gammaB) / (1 - gammaB))) ** 0.5
+        subsonic_u = Cd * Av / mi * (
+            2 * gammaU * rou / (gammaU - 1)) ** 0.5
+        subsonic_b = Cd * Av / mi * (
+            2 * gammaU * rob / (gammaB - 1)) ** 0.5
+
+        self.coefficients = (
+            P1, R, Pa, 1 / gammaU, 1 / gammaU - 1, 1 - 1 / gammaU,
+            gammaE, gammaE - 1, b, area, St,
+            pcrit_u, choked_u, subsonic_u, 2 / gammaU,
+            (gammaU - 1) / gammaU,
+            pcrit_b, choked_b, subsonic_b, 2 / gammaB,
+            (gammaB - 1) / gammaB,
+        )
+
+    def rhs(self, Y, t):
+        """ Time derivatives of [P_, n3, n], `odeint` call signature. """
+        (P1, R, Pa, inv_gu, inv_gu_m1, one_m_inv_gu, gammaE, gammaE_m1, b,
+         area, St, pcrit_u, choked_u, subsonic_u, exp_u, ratio_u,
+         pcrit_b, choked_b, subsonic_b, exp_b, ratio_b) = self.coefficients
+
+        P_ = Y[0]
+        n3 = Y[1]
+        n = Y[2]
+        P = P_ * P1
+
+        r = R * n3 ** (1.0 / 3.0)
+        AV1 = area * r ** 2
+
+        A11 = (1 - n3) * P_ ** inv_gu_m1 * inv_gu
+        A12 = -P_ ** inv_gu
+        A21 = 1 + n3 ** gammaE_m1
+        A22 = P_ * gammaE_m1
+
+        if r < R:  # Unburnt gas venting
+            if P <= Pa:  # No outflow below ambient pressure
+                ddt_mv_mi = 0
+            elif Pa / P < pcrit_u:
+                ddt_mv_mi = choked_u * P ** 0.5
+            else:
+                ddt_mv_mi = subsonic_u * (P * (P / Pa) ** exp_u * (
+                    1 - (Pa / P) ** ratio_u)) ** 0.5
+            dndt = AV1 * P_ ** inv_gu * St
+            if n3 >= 1:
+                dndt = 0
+            B2 = b * dndt - P_ ** one_m_inv_gu * ddt_mv_mi
+
+        else:  # burnt gas venting
+            if P <= Pa:  # No outflow below ambient pressure
+                ddt_mv_mi = 0
+            elif Pa / P < pcrit_b:
+                ddt_mv_mi = choked_b * P ** 0.5
+            else:
+                ddt_mv_mi = subsonic_b * (P * (P / Pa) ** exp_b * (
+                    1 - (Pa / P) ** ratio_b)) ** 0.5
+            dndt = AV1 * P_ ** inv_gu * St - ddt_mv_mi
+            if n3 >= 1:
+                dndt = 0
+            B2 = b * dndt + (b - gammaE * P_ * n3 / n) * ddt_mv_mi
+        B1 = -dndt - ddt_mv_mi
+        det = A11 * A22 - A12 * A21
+        dPdt = (B1 * A22 - B2 * A12) / det
+        dn3dt = (B2 * A11 - B1 * A21) / det
+        return [dPdt, dn3dt, dndt]
+
+    def fun(self, t, Y):
+        """ Time derivatives of [P_, n3, n], `OdeSolver` call signature. """
+        return self.rhs(Y, t)
+
+    def peak(self, t, Y):
+        """ Event function, pressure derivative crosses zero downwards. """
+        return self.rhs(Y, t)[0]
+
+    def wall(self, t, Y):
+        """ Event function, the flame reaches the wall (r == R). """
+        return Y[1] - 1
+
+    def ambient(self, t, Y):
+        """ Event function, the pressure returns to ambient. """
+        return Y[0] - 1
+
+    def settled(self, t, Y):
+        """ Event function, peak pressure after the flame reached the wall.
+
+        No gas burns once the flame reaches the wall, so the first pressure
+        decrease after that point settles the peak pressure.
+        """
+        if Y[1] < 1:
+            return 1.0
+        return self.rhs(Y, t)[0]
+
+
+# Event name: direction of the zero crossing
+EVENTS = {'peak': -1, 'wall': 1, 'ambient': -1, 'settled': -1}
+
+
 def vent_gas_explosion(Y, t, P1, R, V1, gammaE, Pf_, gammaU, mi, gas_u, S, rou,
                        rob, gammaB, Cd, Av, f, T1, Pa):
-    P_ = Y[0]
-    n3 = Y[1]
-    n = Y[2]
-    P = P_ * P1
-
-    r = R * (n3) ** (1.0 / 3.0)
-    AV1 = 4 * np.pi * r ** 2 / V1
-    b = gammaE * Pf_ - 1
-
-    A11 = (1 - n3) * P_ ** (1 / gammaU - 1) / gammaU
-    A12 = -P_ ** (1 / gammaU)
-    A21 = 1 + n3 ** (gammaE - 1)
-    A22 = P_ * (gammaE - 1)
-
-    # St = S * f * P_ ** 0.1
-    # nu = 1 - n  # Ratio of unburned mass/initial mass
-    # mu = mi * nu  # Mass of unburned gas
-    # Number of unburned moles
-    # nmu = mu / (gas_u.mean_molecular_weight / 1000)
-
-    # Vu = (1 - n3) * V1
-    # Tu = P_ * P1 * Vu / (nmu * RR)
-    # St = S * f * (P_ ** 0.1) * ((Tu / T1) ** 1.721)
-    St = S * f
-
-    if r < R:  # Unburnt gas venting
-        PcriticalInv = (2 / (gammaU + 1)) ** (gammaU / (gammaU - 1))
-        if Pa / P < PcriticalInv:
-            ddt_mv_mi = Cd * Av * rou / mi * (
-                        gammaU * P / rou * ((1 + gammaU) / 2) ** ((1 + gammaU) / (1 - gammaU))) ** 0.5  # noqa
-        else:
-            ddt_mv_mi = Cd * Av / mi * (2 * gammaU * P * rou / (gammaU - 1) * (P / Pa) ** (2 / gammaU) * (  # noqa
-                        1 - (Pa / P) ** ((gammaU - 1) / gammaU))) ** 0.5
-        dndt = (AV1) * P_ ** (1 / gammaU) * St
-        if n3 >= 1:
-            dndt = 0
-        B2 = b * dndt - P_ ** (1 - 1 / gammaU) * ddt_mv_mi
-
-    else:  # burnt gas venting
-        PcriticalInv = (2 / (gammaB + 1)) ** (gammaB / (gammaB - 1))
-        if Pa / P < PcriticalInv:
-            ddt_mv_mi = Cd * Av * rob / mi * (
-                        gammaB * P / rob * ((1 + gammaB) / 2) ** ((1 + gammaB) / (1 - gammaB))) ** 0.5  # noqa
-        else:
-            ddt_mv_mi = Cd * Av / mi * (2 * gammaU * P * rob / (gammaB - 1) * (P / Pa) ** (2 / gammaB) * (  # noqa
-                        1 - (Pa / P) ** ((gammaB - 1) / gammaB))) ** 0.5
-        dndt = (AV1) * P_ ** (1 / gammaU) * St - ddt_mv_mi
-        if n3 >= 1:
-            dndt = 0
-        B2 = b * dndt + (b - gammaE * P_ * n3 / n) * ddt_mv_mi
-    B1 = -dndt - ddt_mv_mi
-    dPdt = (B1 * A22 - B2 * A12) / (A11 * A22 - A12 * A21)
-    dn3dt = (B2 * A11 - B1 * A21) / (A11 * A22 - A12 * A21)
-    dydt = [dPdt, dn3dt, dndt]
-    return dydt
+    """ Single evaluation of the explosion ODE system.
+
+    Kept for backwards compatibility, `Explosion.run` integrates an
+    `ExplosionEngine` directly.
+    """
+    engine = ExplosionEngine(P1, R, V1, gammaE, Pf_, gammaU, mi, S, rou, rob,
+                             gammaB, Cd, Av, f, Pa)
+    return engine.rhs(Y, t)
+
+
+def odeint_chunks(rhs, init, t, progress, chunks=CHUNKS):
+    """ Integrate with odeint over consecutive parts of a time grid.
+
+    Parameters
+    ----------
+    rhs : Callable
+        Right hand side of the ODEs, rhs(Y, t).
+    init : List
+        Initial values.
+    t : ndarray
+        Time grid.
+    progress : Callable
+        Called with the times and the solution so far after each part,
+        the integration stops when it returns False.
+    chunks : Int
+        Number of parts.
+
+    Returns
+    -------
+    Tuple
+        Times and solution, up to the last part integrated.
+    """
+    x = np.empty((len(t), len(init)))
+    x[0] = init
+    bounds = np.linspace(0, len(t) - 1, chunks + 1).astype(int)
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        # Each part starts from the end of the previous one
+        x[start:stop + 1] = odeint(rhs, x[start], t[start:stop + 1])
+        if progress(t[:stop + 1], x[:stop + 1]) is False:
+            return t[:stop + 1], x[:stop + 1]
+    return t, x
+
+
+def integrate_adaptive(engine, init, tmax, stop=None, dense_output=False,
+                       threshold=None, rtol=1.49012e-8, atol=1.49012e-8):
+    """ Integrate an explosion with adaptive steps and event detection.
+
+    The vent flow model is undefined below ambient pressure, so the
+    integration always terminates when the pressure returns to ambient.
+
+    Parameters
+    ----------
+    engine : ExplosionEngine
+        ODE system to integrate.
+    init : List
+        Initial [P_, n3, n].
+    tmax : Float
+        Max time for analysis.
+    stop : Unicode
+        Name of an additional terminal event, see `EVENTS`.
+    dense_output : Bool
+        Build a continuous solution from the step interpolants.
+    threshold : Float
+        Terminate as soon as P_ exceeds this value ('threshold' event).
+
+    Returns
+    -------
+    Tuple
+        Times, states (one row per time), dictionary of event name to
+        list of event times and the continuous solution (or None).
+
+    Raises
+    ------
+    IntegrationError
+        If the solver fails or the state stops being finite before a
+        terminal event or `tmax`.
+    """
+    if stop is not None and stop not in EVENTS:
+        raise ValueError(f'Unknown event: {stop}')
+    names = [name for name in EVENTS if name != 'settled' or stop == name]
+    terminal = {'ambient', stop}
+    funcs = [getattr(engine, name) for name in names]
+    directions = [EVENTS[name] for name in names]
+    if threshold is not None:
+        names.append('threshold')
+        terminal.add('threshold')
+        funcs.append(lambda t, Y: Y[0] - threshold)
+        directions.append(1)
+
+    solver = LSODA(engine.fun, 0, np.asarray(init, dtype=float), tmax,
+                   rtol=rtol, atol=atol)
+    ts = [solver.t]
+    ys = [solver.y]
+    interpolants = []
+    events = {name: [] for name in names}
+    g_old = [func(solver.t, solver.y) for func in funcs]
+
+    while solver.status == 'running':
+        solver.step()
+        if solver.status == 'failed':
+            raise IntegrationError(
+                f'Integration failed at t = {solver.t}: {solver.message}')
+        if not np.all(np.isfinite(solver.y)):
+            raise IntegrationError(
+                f'Integration diverged at t = {solver.t}')
+        t_old, t_new, y_new = solver.t_old, solver.t, solver.y
+        interpolant = solver.dense_output()
+        g_new = [func(t_new, y_new) for func in funcs]
+
+        # Locate events within the step
+        found = []
+        for name, func, direction, g0, g1 in zip(names, funcs, directions,
+                                                 g_old, g_new):
+            up = g0 < 0 <= g1
+            down = g0 > 0 >= g1
+            if (up and direction > 0) or (down and direction < 0):
+                te = brentq(lambda tt: func(tt, interpolant(tt)), t_old,
+                            t_new, xtol=4 * np.finfo(float).eps)
+                found.append((te, name))
+        g_old = g_new
+
+        done = False
+        for te, name in sorted(found):
+            events[name].append(te)
+            if te < t_new:
+                ts.append(te)
+                ys.append(interpolant(te))
+            if name in terminal:
+                done = True
+                t_new = te
+                break
+
+        if t_new > ts[-1]:
+            ts.append(t_new)
+            ys.append(y_new)
+        interpolants.append(interpolant)
+        if done:
+            break
+
+    sol = None
+    if dense_output and interpolants:
+        step_ts = [0] + [interp.t for interp in interpolants]
+        step_ts[-1] = ts[-1]
+        sol = OdeSolution(step_ts, interpolants)
+    return np.array(ts), np.array(ys), events, sol
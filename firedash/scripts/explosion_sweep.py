@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Batch parameter sweeps of the explosion model.
+
+Example
+-------
+    scenarios = pd.DataFrame({'fuel': 'H2:1', 'R': [0.2, 0.378],
+                              'Cd': 0.5, 'Av': 0.0929})
+    results = run_sweep(scenarios)
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .cache import make_key
+    from .equilibrium import normalize_composition
+    from .explosion_model import Explosion, Inputs, Patm
+except ImportError:  # Run as a script from the scripts directory
+    from cache import make_key
+    from equilibrium import normalize_composition
+    from explosion_model import Explosion, Inputs, Patm
+
+# Scenario values used when a column is missing
+DEFAULTS = {
+    'air': {'O2': 1, 'N2': 3.76},
+    'phi': 1.0,
+    'f': 1.0,
+    'P': Patm,
+    'T': 298,
+    'tmax': 0.35,
+    'S': None,
+}
+
+SCENARIO_COLUMNS = ['fuel', 'phi', 'R', 'Cd', 'Av', 'S', 'T', 'P', 'tmax']
+RESULT_COLUMNS = ['Pmax', 't_peak', 'Pf_', 'Tb', 'Su', 'S_fallback']
+
+# Scenarios per pool task
+CHUNK_SIZE = 50
+
+
+def run_sweep(scenarios, processes=None, chunksize=CHUNK_SIZE):
+    """ Run a table of explosion scenarios over a process pool.
+
+    Parameters
+    ----------
+    scenarios : DataFrame or List
+        One scenario per row (or dict) with the columns in
+        `SCENARIO_COLUMNS`, optionally 'air' and 'f'. Missing columns take
+        their value from `DEFAULTS`.
+    processes : Int
+        Number of worker processes, all cores by default. With 1 the sweep
+        runs in the calling process.
+    chunksize : Int
+        Number of scenarios per pool task.
+
+    Returns
+    -------
+    DataFrame
+        Scenarios with the columns Pmax (peak P/P0), t_peak (s), Pf_, Tb
+        (K), Su (m/s) and S_fallback (1 where Su is the default of the
+        flame speed table), plus 'error' for scenarios that failed.
+    """
+    scenarios = pd.DataFrame(scenarios).reset_index(drop=True)
+    for column, value in DEFAULTS.items():
+        if column not in scenarios:
+            scenarios[column] = [value] * len(scenarios)
+    records = scenarios.to_dict('records')
+
+    # Thermodynamic setup is shared by all scenarios with the same gas
+    gas_keys = [_gas_key(record) for record in records]
+    gases = {}
+    for key, record in zip(gas_keys, records):
+        gases.setdefault(key, record)
+
+    # Keep scenarios with the same gas together
+    order = sorted(range(len(records)), key=lambda i: gas_keys[i])
+    chunks = [order[i:i + chunksize] for i in range(0, len(order), chunksize)]
+
+    if processes == 1:
+        thermos = dict(zip(gases, map(_thermo, gases.values())))
+        outputs = [_run_chunk([(i, records[i], thermos[gas_keys[i]])
+                               for i in chunk]) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            thermos = dict(zip(gases, pool.map(_thermo, gases.values())))
+            tasks = [[(i, records[i], thermos[gas_keys[i]]) for i in chunk]
+                     for chunk in chunks]
+            outputs = list(pool.map(_run_chunk, tasks))
+
+    # Columnar results
+    n = len(records)
+    results = {column: np.full(n, np.nan) for column in RESULT_COLUMNS}
+    errors = np.full(n, None, dtype=object)
+    for output in outputs:
+        for i, values, error in output:
+            for column, value in zip(RESULT_COLUMNS, values):
+                results[column][i] = value
+            errors[i] = error
+
+    for column in RESULT_COLUMNS:
+        scenarios[column] = results[column]
+    scenarios['error'] = errors
+    return scenarios
+
+
+def _gas_key(record):
+    """ Key of the gas of a scenario. """
+    return make_key(normalize_composition(record['fuel']),
+                    normalize_composition(record['air']),
+                    float(record['phi']), float(record['T']),
+                    float(record['P']))
+
+
+def _thermo(record):
+    """ Thermodynamic states of the gas of a scenario. """
+    try:
+        return Explosion(scenario=Inputs(**record)).thermo()
+    except Exception as error:
+        return error
+
+
+def _run_chunk(tasks):
+    """ Run (index, scenario, thermo) tasks, returns (index, values, error).
+    """
+    output = []
+    for i, record, thermo in tasks:
+        values = [np.nan] * len(RESULT_COLUMNS)
+        error = None
+        try:
+            if isinstance(thermo, Exception):
+                raise thermo
+            explosion = Explosion(scenario=Inputs(**record))
+            explosion.run(solver='adaptive', stop='settled', thermo=thermo)
+            peak = np.nanargmax(explosion.P_)
+            values = [explosion.P_[peak], explosion.t[peak], explosion.Pf_,
+                      explosion.Tb, explosion.Su, explosion.S_fallback]
+        except Exception as e:
+            error = str(e)
+        output.append((i, values, error))
+    return output
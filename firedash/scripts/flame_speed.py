@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Laminar flame speed sweeps over equivalence ratios.
+
+Fuels are solved in parallel, one fuel per worker process. Within a fuel
+every equivalence ratio starts from the converged grid and solution of the
+previous one instead of a cold start, which saves most of the Newton and
+grid refinement iterations.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import cantera as ct
+import numpy as np
+
+try:
+    from .checkpoint import CheckpointStore, run_key
+    from .mechanisms import get_solution
+except ImportError:  # Run as a script from the scripts directory
+    from checkpoint import CheckpointStore, run_key
+    from mechanisms import get_solution
+
+# Equivalence ratios of a sweep
+PHIS = np.arange(0.5, 1.6, 0.05)
+
+OXIDIZER = 'O2:1.0, N2:3.76'
+Pi = 101000  # Initial pressure Pa
+Ti = 300  # Initial unburned gas temperature K
+
+
+def flame_speed_key(phi):
+    """ Checkpoint key of the flame speed at an equivalence ratio. """
+    return 'SL_' + str(phi)
+
+
+def flame_speeds(fuel, phis=PHIS, store_path=None, loglevel=0):
+    """ Laminar flame speeds of a fuel, solved by continuation in phi.
+
+    Parameters
+    ----------
+    fuel : Dict
+        Fuel composition.
+    phis : List
+        Equivalence ratios, solved in the given order.
+    store_path : Unicode
+        File of a `CheckpointStore`, results found there are not solved
+        again and new results are persisted as soon as they converge.
+    loglevel : Int
+        Cantera log level.
+
+    Returns
+    -------
+    Dict
+        Flame speed (m/s) by equivalence ratio, None where the solve failed.
+    """
+    store = CheckpointStore(store_path) if store_path else None
+    run = run_key('flame_speed', fuel)
+    gas = get_solution(slot='flame')
+    flame = None
+    speeds = {}
+
+    for phi in phis:
+        key = flame_speed_key(phi)
+        if store is not None and store.done(run, key):
+            speeds[phi] = store.get(run, key)
+            continue
+
+        gas.set_equivalence_ratio(phi, fuel, OXIDIZER)
+        gas.TP = Ti, Pi
+        try:
+            if flame is None:
+                # A freely-propagating flat flame
+                flame = ct.FreeFlame(gas, width=5)
+                # Energy equation enabled
+                flame.energy_enabled = True
+                flame.set_max_time_step(50000)
+                flame.set_refine_criteria(ratio=2.0, slope=0.05, curve=0.05)
+                # Solve with multi or mix component transport properties
+                flame.transport_model = 'Mix'
+                flame.solve(loglevel=loglevel, auto=True, refine_grid=True)
+            else:
+                # Continue from the solution of the previous phi
+                flame.inlet.X = gas.X
+                flame.inlet.T = Ti
+                flame.P = Pi
+                flame.solve(loglevel=loglevel, refine_grid=True, auto=False)
+            speeds[phi] = flame.u[0]
+            print('Flamespeed Done! ', phi, flame.u[0])
+        except Exception:
+            print('ERROR! Something went wrong', phi)
+            speeds[phi] = None
+            # The next phi starts cold again
+            flame = None
+            continue
+
+        if store is not None:
+            store.put(run, key, speeds[phi])
+
+    return speeds
+
+
+def flame_speed_sweep(fuels, phis=PHIS, processes=None, store_path=None):
+    """ Laminar flame speeds of several fuels over a process pool.
+
+    Parameters
+    ----------
+    fuels : List
+        Fuel compositions.
+    phis : List
+        Equivalence ratios of every fuel.
+    processes : Int
+        Number of worker processes, all cores by default.
+    store_path : Unicode
+        File of a `CheckpointStore` to persist results per fuel and phi.
+
+    Returns
+    -------
+    List
+        Flame speeds by equivalence ratio, one dict per fuel.
+    """
+    phis = list(phis)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(flame_speeds, fuel, phis, store_path)
+                   for fuel in fuels]
+        return [future.result() for future in futures]
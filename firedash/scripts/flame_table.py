@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Precomputed laminar flame speed table.
+
+The table holds laminar burning velocities of a set of fuel compositions
+over a grid of equivalence ratios, solved once with `flame_speed_sweep` and
+stored as a compressed numpy archive. It is loaded once per process and
+queried without Cantera: speeds are interpolated linearly in phi and by
+inverse distance weighting between the tabulated compositions close to the
+query. Queries outside the coverage of the table return `DEFAULT_SPEED`
+flagged as a fallback.
+
+Build a table from the literature gas data, from the firedash directory:
+
+    python -m scripts.flame_table scripts/data.csv
+"""
+
+import collections
+import os
+import sys
+import threading
+import warnings
+
+import numpy as np
+
+# Format version of the table file
+VERSION = 1
+
+# Table file, `FIREDASH_FLAME_TABLE` if set
+TABLE_PATH = os.environ.get(
+    'FIREDASH_FLAME_TABLE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                 'flame_speeds.npz'))
+
+# Flame speed (m/s) used outside the coverage of the table
+DEFAULT_SPEED = 0.45
+
+# Max L1 distance between the query and a tabulated composition
+RADIUS = 0.05
+
+# Max difference of the initial temperature (K) and relative difference of
+# the initial pressure from the conditions of the table
+T_TOLERANCE = 5.0
+P_TOLERANCE = 0.05
+
+FlameSpeed = collections.namedtuple('FlameSpeed', ['S', 'fallback'])
+
+FlameSpeedTable = collections.namedtuple(
+    'FlameSpeedTable', ['species', 'index', 'phis', 'compositions',
+                        'speeds', 'T', 'P'])
+
+_tables = {}
+_lock = threading.Lock()
+
+
+def load_table(path=None):
+    """ Load a flame speed table, once per process.
+
+    Parameters
+    ----------
+    path : Unicode
+        Table file, `TABLE_PATH` by default.
+
+    Returns
+    -------
+    FlameSpeedTable
+        The table, None if the file is missing or of another version, with
+        a warning that all queries get `DEFAULT_SPEED`.
+    """
+    path = path or TABLE_PATH
+    with _lock:
+        if path not in _tables:
+            _tables[path] = _read(path)
+            if _tables[path] is None:
+                warnings.warn(f'No flame speed table of version {VERSION} '
+                              f'at {path}, all flame speeds are the default '
+                              f'{DEFAULT_SPEED} m/s')
+        return _tables[path]
+
+
+def flame_speed(fuel, phi, T=None, P=None, path=None, radius=RADIUS):
+    """ Laminar flame speed of a fuel from the precomputed table.
+
+    The table only holds speeds at its initial temperature and pressure,
+    other conditions get the fallback.
+
+    Parameters
+    ----------
+    fuel : Dict or Unicode
+        Fuel composition, e.g. {'H2': 1} or 'CO:0.5, H2:0.5'.
+    phi : Float
+        Equivalence ratio.
+    T : Float
+        Initial temperature (K), not checked if None.
+    P : Float
+        Initial pressure (Pa), not checked if None.
+    path : Unicode
+        Table file, `TABLE_PATH` by default.
+    radius : Float
+        Max L1 distance of the tabulated compositions used.
+
+    Returns
+    -------
+    FlameSpeed
+        Flame speed (m/s) and whether it is the `DEFAULT_SPEED` fallback.
+    """
+    fallback = FlameSpeed(DEFAULT_SPEED, True)
+    table = load_table(path)
+    if table is None or not table.phis[0] <= phi <= table.phis[-1]:
+        return fallback
+    if T is not None and abs(T - table.T) > T_TOLERANCE:
+        return fallback
+    if P is not None and abs(P - table.P) > P_TOLERANCE * table.P:
+        return fallback
+
+    x = _vector(table, fuel)
+    if x is None:
+        return fallback
+
+    distances = np.abs(table.compositions - x).sum(axis=1)
+    near = distances <= radius
+    if not near.any():
+        return fallback
+
+    # Linear in phi
+    i = min(max(np.searchsorted(table.phis, phi), 1), len(table.phis) - 1)
+    phi0, phi1 = table.phis[i - 1], table.phis[i]
+    w = (phi - phi0) / (phi1 - phi0)
+    lower, upper = table.speeds[near, i - 1], table.speeds[near, i]
+    # Do not lose tabulated points next to failed solves
+    speeds = np.where(w == 0, lower,
+                      np.where(w == 1, upper, (1 - w) * lower + w * upper))
+
+    # Inverse distance weighting between compositions
+    valid = ~np.isnan(speeds)
+    if not valid.any():
+        return fallback
+    weights = 1 / np.maximum(distances[near][valid], 1E-12)
+    S = float(np.dot(weights, speeds[valid]) / weights.sum())
+    return FlameSpeed(S, False)
+
+
+def build_table(fuels, path=None, phis=None, processes=None,
+                store_path=None):
+    """ Solve flame speeds of fuel compositions and write a table.
+
+    Parameters
+    ----------
+    fuels : List
+        Fuel compositions, as dicts.
+    path : Unicode
+        Table file, `TABLE_PATH` by default.
+    phis : List
+        Equivalence ratios, `flame_speed.PHIS` by default.
+    processes : Int
+        Number of worker processes, all cores by default.
+    store_path : Unicode
+        File of a `CheckpointStore` to persist the flame solves.
+
+    Returns
+    -------
+    FlameSpeedTable
+        The new table.
+    """
+    try:
+        from .flame_speed import PHIS, Pi, Ti, flame_speed_sweep
+    except ImportError:  # Run as a script from the scripts directory
+        from flame_speed import PHIS, Pi, Ti, flame_speed_sweep
+
+    path = path or TABLE_PATH
+    phis = np.asarray(PHIS if phis is None else phis, dtype=float)
+    fuels = [{name: float(value) for name, value in fuel.items() if value > 0}
+             for fuel in fuels]
+    species = sorted({name for fuel in fuels for name in fuel})
+
+    compositions = np.zeros((len(fuels), len(species)), dtype=np.float32)
+    for row, fuel in enumerate(fuels):
+        total = sum(fuel.values())
+        for name, value in fuel.items():
+            compositions[row, species.index(name)] = value / total
+
+    speeds = np.full((len(fuels), len(phis)), np.nan, dtype=np.float32)
+    results = flame_speed_sweep(fuels, phis, processes=processes,
+                                store_path=store_path)
+    for row, result in enumerate(results):
+        for column, phi in enumerate(phis):
+            if result.get(phi) is not None:
+                speeds[row, column] = result[phi]
+
+    np.savez_compressed(path, version=VERSION, species=np.array(species),
+                        phis=phis, compositions=compositions, speeds=speeds,
+                        T=Ti, P=Pi)
+    with _lock:
+        _tables.pop(path, None)
+    return load_table(path)
+
+
+def _read(path):
+    """ Read a table file, None if missing or of another version. """
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        if int(data['version']) != VERSION:
+            return None
+        species = [str(name) for name in data['species']]
+        return FlameSpeedTable(
+            species=species,
+            index={name: i for i, name in enumerate(species)},
+            phis=data['phis'],
+            compositions=data['compositions'].astype(float),
+            speeds=data['speeds'].astype(float),
+            T=float(data['T']),
+            P=float(data['P']))
+
+
+def _vector(table, fuel):
+    """ Normalized mole fractions of a fuel on the table species.
+
+    Returns None if the fuel has species the table does not cover.
+    """
+    if isinstance(fuel, str):
+        pairs = [item.split(':') for item in fuel.split(',') if item.strip()]
+        fuel = {name.strip(): float(value) for name, value in pairs}
+
+    x = np.zeros(len(table.species))
+    for name, value in fuel.items():
+        if value <= 0:
+            continue
+        if name not in table.index:
+            return None
+        x[table.index[name]] = value
+    total = x.sum()
+    return x / total if total > 0 else None
+
+
+def _literature_fuels(filename):
+    """ Fuel compositions of the rows of the literature gas data.
+
+    Gases are lumped like the fuels of the queries, with `fuel_species`.
+    """
+    import pandas as pd
+
+    from db.ids import fuel_species
+
+    df = pd.read_csv(filename)
+    gases = df.columns[df.columns.get_loc('Notes') + 1:]
+
+    values = df[gases].apply(pd.to_numeric, errors='coerce').fillna(0)
+
+    fuels = []
+    for _, row in values.iterrows():
+        fuel = fuel_species({name: float(value)
+                             for name, value in row.items()})
+        if sum(fuel.values()) > 0 and fuel not in fuels:
+            fuels.append(fuel)
+    return fuels
+
+
+if __name__ == '__main__':
+    build_table(_literature_fuels(sys.argv[1]),
+                store_path='flame_table.sqlite')
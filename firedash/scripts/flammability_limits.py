@@ -5,16 +5,24 @@ Created on Wed Sep  4 10:38:16 2019
 @author: erik
 """
 
-import cantera as ct
 import pandas as pd
 import numpy as np
 import collections
+from concurrent.futures import ProcessPoolExecutor
+import os
 import os.path as op
 
 import plotly.io as pio
 import plotly.figure_factory as ff
 import time
 
+try:
+    from .checkpoint import run_key
+    from .equilibrium import equilibrate
+except ImportError:  # Run as a script from the scripts directory
+    from checkpoint import run_key
+    from equilibrium import equilibrate
+
 pio.renderers.default = "browser"
 # Remove extra leading /
 pio.orca.config._constants['plotlyjs'] = pio.orca.config.plotlyjs[1:]
@@ -36,10 +44,6 @@ def makeAxis(title, tickangle):
 # Setup Cantera
 Pi = 101000  # Initial pressure Pa
 Ti = 300  # Initial unburned gas temperature K
-carbon = ct.Solution('graphite.xml')
-# Calls Gas Properties from Gri-MECH
-gas = ct.Solution('gri30.xml', 'gri30_mix')
-mix = ct.Mixture([(gas, 1.0), (carbon, 0.0)])
 
 fuel10Ah = {'CO2': 44, 'CO': 15, 'H2': 31, 'CH4': 6, 'C3H8': 4}
 # 100 Percent Charge C
@@ -53,22 +57,33 @@ air = {'N2': 3.76, 'O2': 1}
 fuel = fuelLFP
 
 data_path = op.join(op.dirname(__file__),
-                    'example_data', 'TempCriteriaData.xlsx')
-dfTempCrit = pd.read_excel(data_path, index_col=0)
+                    'example_data', 'TempCriteriaData.csv')
+_dfTempCrit = None
 
 gaslist = ['H2', 'CO', 'CH4', 'C2H6', 'C3H8']
 gaslistinert = ['H2O', 'CO2', 'N2']
 gaslistfull = ['H2', 'CO', 'CH4', 'C2H6', 'C3H8', 'H2O', 'CO2', 'N2', 'O2']
 
 
+def tempCriteria():
+    """ Flame temperatures at the lower (Tl) and upper (Tu) flammability
+    limits of the fuel gases, read on first use.
+    """
+    global _dfTempCrit
+    if _dfTempCrit is None:
+        _dfTempCrit = pd.read_csv(data_path, index_col=0, comment='#')
+    return _dfTempCrit
+
+
 # Determine Tblend Temperature for given gas mixture
 def Tblend(mixx):
+    dfTempCrit = tempCriteria()
     mx = collections.defaultdict(lambda: 0, mixx)
     mx = {key: mx[key] for key in gaslist}
     total = sum([mx[key] for key in gaslist])
     alpha = [mx[key] / total for key in mx]
     Tui = [dfTempCrit.loc[key]['Tu'] for key in gaslist]
-    Tli = [dfTempCrit.loc[key]['Tu'] for key in gaslist]
+    Tli = [dfTempCrit.loc[key]['Tl'] for key in gaslist]
     Tl = np.dot(alpha, Tli)
     Tu = np.dot(alpha, Tui)
     return Tl, Tu
@@ -76,34 +91,23 @@ def Tblend(mixx):
 
 # Run Equilibrium
 def Eq(fuel, phi):
-    gas = ct.Solution('gri30.xml', 'gri30_mix')
-    gas.set_equivalence_ratio(phi, fuel, air)
-    mix = ct.Mixture([(gas, 1.0), (carbon, 0.0)])
-    mix.T = Ti
-    mix.P = Pi
-    mix.equilibrate('HP')
-    print(mix.T)
-    Xf = 1 - sum(mix.phase(0)['N2', 'O2'].X)
-    Xff = 1 - sum(mix.phase(0)['N2', 'O2', 'H2O', 'CO2'].X)
-    Xair = 1 - Xf
-    dResult = {'phi': phi, 'Tad': mix.T, 'Xf': Xf, 'Xff': Xff,
-               'air': Xair, 'O2': mix.phase(0)['O2'].X}
-    return dResult
+    _, products = equilibrate('HP', Ti, Pi, phi=phi, fuel=fuel, oxidizer=air)
+    print(products.T)
+    return _equilibrium_result(phi, products)
 
 
 def Eqq(X):
-    gas = ct.Solution('gri30.xml', 'gri30_mix')
-    gas.X = X
-    mix = ct.Mixture([(gas, 1.0), (carbon, 0.0)])
-    phi = gas.get_equivalence_ratio()
-    mix.T = Ti
-    mix.P = Pi
-    mix.equilibrate('HP')
-    Xf = 1 - sum(mix.phase(0)['N2', 'O2'].X)
-    Xff = 1 - sum(mix.phase(0)['N2', 'O2', 'H2O', 'CO2'].X)
+    reactants, products = equilibrate('HP', Ti, Pi, X=X)
+    return _equilibrium_result(reactants.phi, products)
+
+
+def _equilibrium_result(phi, products):
+    X = collections.defaultdict(lambda: 0, products.X)
+    Xf = 1 - (X['N2'] + X['O2'])
+    Xff = 1 - (X['N2'] + X['O2'] + X['H2O'] + X['CO2'])
     Xair = 1 - Xf
-    dResult = {'phi': phi, 'Tad': mix.T, 'Xf': Xf, 'Xff': Xff,
-               'air': Xair, 'O2': mix.phase(0)['O2'].X}
+    dResult = {'phi': phi, 'Tad': products.T, 'Xf': Xf, 'Xff': Xff,
+               'air': Xair, 'O2': np.array([X['O2']])}
     return dResult
 
 
@@ -126,58 +130,336 @@ def fixDict(Od):
     return dd
 
 
-def doAnalysis(fuel):
-    gas.set_equivalence_ratio(1.0, fuel, air)
-    mix = ct.Mixture([(gas, 1.0), (carbon, 0.0)])
-    mix.T = Ti
-    mix.P = Pi
-    mix.equilibrate('HP')
-    products = mix.phase(0)
-    prodx = dict(zip(products.species_names, products.X))
-    fuel = fixDict(fuel)
-    ox = fixDict({'N2': 3.76, 'O2': 1})
-    inert = fixDict(prodx)
-    dfOut = pd.DataFrame(columns=['Xf', 'Xa', 'Xi', 'phi', 'Tad', 'Flammable'])
-    Xf = 0.01
-    haseverburned = False
-    while Xf <= 1.:
-        Xa = round(1.0 - Xf, 3)
-        burned = False
-        while Xa >= 0:
-            Xi = abs(round(1.00 - Xf - Xa, 3))
-            MMIX = collections.defaultdict(lambda: 0)
-            for key in gaslistfull:
-                MMIX[key] = Xf * fuel[key] + Xa * ox[key] + Xi * inert[key]
-            Tl, Tu = Tblend(MMIX)
-            dres = Eqq(MMIX)
-            if dres['phi'] > 1:
-                if dres['Tad'] > Tu:
-                    Flammable = 1
-                    burned = True
-                    haseverburned = True
-                else:
-                    Flammable = 0
+# Columns of a flammability map
+GRID_COLUMNS = ['Xf', 'Xa', 'Xi', 'phi', 'Tad', 'Flammable']
+
+
+def isFlammable(phi, Tad, Tl, Tu):
+    """ Temperature criterion, 1 if the mixture is flammable else 0. """
+    if phi > 1:
+        return 1 if Tad > Tu else 0
+    return 1 if Tad > Tl else 0
+
+
+def evaluatePoint(Xf, Xa, Xi, fuel, ox, inert):
+    """ Equilibrate one point of the ternary diagram.
+
+    Returns
+    -------
+    Tuple
+        phi, Tad and Flammable of the point.
+    """
+    MMIX = collections.defaultdict(lambda: 0)
+    for key in gaslistfull:
+        MMIX[key] = (Xf * fuel.get(key, 0) + Xa * ox.get(key, 0) +
+                     Xi * inert.get(key, 0))
+    Tl, Tu = Tblend(MMIX)
+    dres = Eqq(MMIX)
+    Flammable = isFlammable(dres['phi'], dres['Tad'], Tl, Tu)
+    return dres['phi'], dres['Tad'], Flammable
+
+
+def _mixtureDicts(fuel):
+    """ Normalized fuel, air and inert (stoichiometric products) dicts. """
+    _, products = equilibrate('HP', Ti, Pi, phi=1.0, fuel=fuel, oxidizer=air)
+    prodx = products.X
+    return (dict(fixDict(fuel)), dict(fixDict({'N2': 3.76, 'O2': 1})),
+            dict(fixDict(prodx)))
+
+
+def _flammability_row(Xf, seed, fuel, ox, inert):
+    """ Evaluate all points of one fuel fraction of the grid.
+
+    The air fraction is stepped down coarsely while the last two points
+    are not flammable and finely otherwise. `seed` is the flammability of
+    the point evaluated before the row.
+
+    Returns
+    -------
+    Tuple
+        Dict of column arrays of the row, whether any point burned and the
+        flammability of the last point.
+    """
+    size = int(round((1.0 - Xf) * 100)) + 3
+    columns = {name: np.empty(size) for name in GRID_COLUMNS}
+    columns['Flammable'] = np.empty(size, dtype=np.uint8)
+
+    n = 0
+    last = seed
+    Xa = round(1.0 - Xf, 3)
+    while Xa >= 0:
+        Xi = abs(round(1.00 - Xf - Xa, 3))
+        phi, Tad, Flammable = evaluatePoint(Xf, Xa, Xi, fuel, ox, inert)
+        for name, value in zip(GRID_COLUMNS,
+                               (Xf, Xa, Xi, phi, Tad, Flammable)):
+            columns[name][n] = value
+        n += 1
+        print(Xf, Xa, Xi, Flammable, Tad)
+        if last + Flammable == 0:
+            Xa = round(Xa - 0.1, 1)
+        else:
+            Xa = round(Xa - 0.01, 3)
+        last = Flammable
+
+    columns = {name: values[:n] for name, values in columns.items()}
+    return columns, bool(columns['Flammable'].any()), last
+
+
+def _next_fuel_fractions(Xf, count):
+    """ Fuel fractions that may follow `Xf`, nearest first. """
+    found = []
+    frontier = [Xf]
+    while frontier and len(found) < count:
+        following = []
+        for value in frontier:
+            for step in (round(value + 0.01, 3), round(value + 0.1, 1)):
+                if step <= 1. and step not in found:
+                    found.append(step)
+                    following.append(step)
+        frontier = following
+    return found[:count]
+
+
+def doAnalysis(fuel, processes=None, store=None):
+    """ Compute the flammability map of a fuel over the ternary diagram.
+
+    The fuel fraction is stepped coarsely once the map has burned and the
+    current row burned, finely otherwise. Rows are evaluated in a process
+    pool, speculatively ahead of the sequential stepping; a row is only
+    re-evaluated if its speculative seed turns out to be wrong.
+
+    Parameters
+    ----------
+    fuel : Dict
+        Fuel composition.
+    processes : Int
+        Number of worker processes, all cores by default. With 1 the map
+        is computed in the calling process.
+    store : CheckpointStore
+        Store to checkpoint completed rows in. Rows found in the store are
+        not computed again, so an interrupted run resumes where it stopped.
+
+    Returns
+    -------
+    DataFrame
+        Columns Xf, Xa, Xi, phi, Tad and Flammable.
+    """
+    args = _mixtureDicts(fuel)
+    run = run_key('flammability', fuel)
+
+    pool = None
+    if processes != 1:
+        processes = processes or os.cpu_count()
+        pool = ProcessPoolExecutor(max_workers=processes)
+    futures = {}
+
+    def stored(Xf, seed):
+        if store is not None:
+            return store.get(run, f'{Xf}:{seed}')
+
+    def submit(Xf, seed):
+        if (Xf, seed) not in futures and stored(Xf, seed) is None:
+            futures[(Xf, seed)] = pool.submit(_flammability_row, Xf, seed,
+                                              *args)
+
+    def row(Xf, seed):
+        result = stored(Xf, seed)
+        if result is not None:
+            return result
+        if pool is None:
+            result = _flammability_row(Xf, seed, *args)
+        else:
+            submit(Xf, seed)
+            # Speculative rows assume a non flammable seed
+            for value in _next_fuel_fractions(Xf, 2 * processes):
+                submit(value, 0)
+            result = futures.pop((Xf, seed)).result()
+        if store is not None:
+            store.put(run, f'{Xf}:{seed}', result)
+        return result
+
+    rows = []
+    try:
+        Xf = 0.01
+        seed = 0
+        haseverburned = False
+        while Xf <= 1.:
+            if pool is None:
+                columns, burned, last = row(Xf, seed)
             else:
-                if dres['Tad'] > Tl:
-                    Flammable = 1
-                    haseverburned = True
-                    burned = True
-                else:
-                    Flammable = 0
-            dfOut = dfOut.append(
-                {'Xf': Xf, 'Xa': Xa, 'Xi': Xi, 'phi': dres['phi'],
-                 'Tad': dres['Tad'], 'Flammable': Flammable},
-                ignore_index=True)
-            print(Xf, Xa, Xi, Flammable, dres['Tad'])
-            if sum(dfOut.iloc[-2::]['Flammable']) == 0.0:
-                Xa = round(Xa - 0.1, 1)
+                columns, burned, last = row(Xf, 0)
+                if seed and columns['Flammable'][0] == 0:
+                    # The first step of the row depends on the seed
+                    columns, burned, last = row(Xf, seed)
+            rows.append(columns)
+            seed = last
+            haseverburned = haseverburned or burned
+            if haseverburned and burned:
+                Xf = round(Xf + 0.1, 1)
             else:
-                Xa = round(Xa - 0.01, 3)
-        if haseverburned and burned:
-            Xf = round(Xf + 0.1, 1)
+                Xf = round(Xf + 0.01, 3)
+    finally:
+        if pool is not None:
+            for future in futures.values():
+                future.cancel()
+            pool.shutdown()
+
+    return _assemble(rows)
+
+
+def storedAnalysis(fuel, store):
+    """ Flammability map of the rows of a run completed so far.
+
+    Can be called while `doAnalysis` is still running in another process.
+    """
+    rows = {}
+    for key, (columns, _, _) in store.items(run_key('flammability', fuel)):
+        Xf, seed = key.split(':')
+        Xf = float(Xf)
+        # A row is only stored with seed 1 if that was its actual seed
+        if seed == '1' or Xf not in rows:
+            rows[Xf] = columns
+    return _assemble([rows[Xf] for Xf in sorted(rows)])
+
+
+def _assemble(rows):
+    """ Fill preallocated arrays with the columns of the rows. """
+    size = sum(len(columns['Xf']) for columns in rows)
+    data = {name: np.empty(size) for name in GRID_COLUMNS}
+    data['Flammable'] = np.empty(size, dtype=np.uint8)
+    start = 0
+    for columns in rows:
+        stop = start + len(columns['Xf'])
+        for name in GRID_COLUMNS:
+            data[name][start:stop] = columns[name]
+        start = stop
+    return pd.DataFrame(data, columns=GRID_COLUMNS)
+
+
+def _bisect(flammable, inside, outside, tol):
+    """ Boundary between a flammable and a non flammable parameter value.
+    """
+    while abs(inside - outside) > tol:
+        middle = 0.5 * (inside + outside)
+        if flammable(middle):
+            inside = middle
+        else:
+            outside = middle
+    return 0.5 * (inside + outside)
+
+
+def flammabilityLimits(fuel, Xi=0.0, tol=1E-4):
+    """ Lower and upper flammability limits along a line of constant inert.
+
+    Bisects on the Tad vs Tblend criterion instead of computing the map,
+    `Xi=0` gives the limits on the fuel-air edge.
+
+    Parameters
+    ----------
+    fuel : Dict
+        Fuel composition.
+    Xi : Float
+        Inert (stoichiometric products) fraction of the mixture.
+    tol : Float
+        Tolerance of the limits.
+
+    Returns
+    -------
+    Tuple
+        Fuel fractions Xf of the LFL and UFL, (None, None) if no mixture
+        on the line is flammable.
+    """
+    fuel, ox, inert = _mixtureDicts(fuel)
+
+    def evaluate(Xf):
+        return evaluatePoint(Xf, 1.0 - Xi - Xf, Xi, fuel, ox, inert)
+
+    # The stoichiometric mixture is inside the flammable range if any
+    lean, rich = 0.0, 1.0 - Xi
+    while rich - lean > tol:
+        middle = 0.5 * (lean + rich)
+        if evaluate(middle)[0] > 1:
+            rich = middle
+        else:
+            lean = middle
+    stoich = 0.5 * (lean + rich)
+    if not evaluate(stoich)[2]:
+        return None, None
+
+    def flammable(Xf):
+        return evaluate(Xf)[2] == 1
+
+    lfl = _bisect(flammable, stoich, 0.0, tol)
+    ufl = _bisect(flammable, stoich, 1.0 - Xi, tol)
+    return lfl, ufl
+
+
+def limitingOxygen(fuel, tol=1E-4, rays=10):
+    """ Limiting oxygen concentration of a fuel.
+
+    The LOC is the least oxygen of any flammable mixture. Along a ray of
+    constant fuel-air ratio from the fuel-air edge, the inert fraction is
+    bisected for the most diluted flammable mixture. Rays are scanned
+    between the LFL and the UFL, and the fuel-air ratio of the least oxygen
+    is refined by golden section search around the best ray.
+
+    Parameters
+    ----------
+    fuel : Dict
+        Fuel composition.
+    tol : Float
+        Tolerance of the inert fraction and of the fuel fraction of the
+        rays on the fuel-air edge.
+    rays : Int
+        Number of rays scanned before the refinement.
+
+    Returns
+    -------
+    Float
+        Oxygen mole fraction at the limit, None if the fuel is not
+        flammable in air.
+    """
+    lfl, ufl = flammabilityLimits(fuel, tol=tol)
+    if lfl is None:
+        return None
+    fuel, ox, inert = _mixtureDicts(fuel)
+
+    def oxygen(Xf0):
+        """ Least oxygen on the ray from fuel fraction Xf0 in air. """
+        def point(Xi):
+            return Xf0 * (1.0 - Xi), (1.0 - Xf0) * (1.0 - Xi), Xi
+
+        def flammable(Xi):
+            return evaluatePoint(*point(Xi), fuel, ox, inert)[2] == 1
+
+        if not flammable(0.0):
+            return np.inf
+        Xf, Xa, Xi = point(_bisect(flammable, 0.0, 1.0, tol))
+        return (Xf * fuel.get('O2', 0) + Xa * ox.get('O2', 0) +
+                Xi * inert.get('O2', 0))
+
+    # Scan the rays inside the flammable range of the fuel-air edge
+    edges = np.linspace(lfl, ufl, rays + 2)
+    values = [np.inf] + [oxygen(Xf0) for Xf0 in edges[1:-1]] + [np.inf]
+    best = int(np.argmin(values))
+    if not np.isfinite(values[best]):
+        return None
+
+    # Golden section search between the neighbours of the best ray
+    ratio = (np.sqrt(5) - 1) / 2
+    low, high = edges[best - 1], edges[best + 1]
+    left, right = high - ratio * (high - low), low + ratio * (high - low)
+    f_left, f_right = oxygen(left), oxygen(right)
+    while high - low > tol:
+        if f_left <= f_right:
+            high, right, f_right = right, left, f_left
+            left = high - ratio * (high - low)
+            f_left = oxygen(left)
         else:
-            Xf = round(Xf + 0.01, 3)
-    return dfOut
+            low, left, f_left = left, right, f_right
+            right = low + ratio * (high - low)
+            f_right = oxygen(right)
+    return float(min(values[best], f_left, f_right))
 
 
 def MakePlots(dff, name):
@@ -214,32 +496,33 @@ def MakePlots(dff, name):
     return fgg, fgg2, fgg3
 
 
-# dfLFP = doAnalysis(fuelLFP)
-# dfLFP.to_csv('fuelLFP.csv')
-dfLFP = pd.read_csv('fuelLFP.csv')
-MakePlots(dfLFP, 'LFP 2015')
-
-# dfSom = doAnalysis(fuelSom100pct)
-# dfSom.to_csv('fuelSom.csv')
-# MakePlots(dfSom, 'Somandepalli 100pct')
-#
-# df10Ah = doAnalysis(fuel10Ah)
-# df10Ah.to_csv('fuel10Ah.csv')
-# MakePlots(df10Ah, 'UTFRG 10Ah 100pct')
-#
-# dfCO= doAnalysis({'H2':1})
-#
-# dfMethane = doAnalysis({'CH4':1})
-# dfMethane.to_csv('methane.csv')
-# MakePlots(dfMethane, 'Methane')
-#
-# dfCO = doAnalysis({'CO':1})
-# dfCO.to_csv('CO.csv')
-# MakePlots(dfCO, 'CO')
-#
-# dfH2 = doAnalysis({'H2':1})
-# dfH2.to_csv('H2.csv')
-# MakePlots(dfH2, 'H2')
-#
-# MakePlots(rw10Ah, rw10Ah, df10Ah)
-# MakePlots(rwMethane, rwMethane2, dfMethane)
+if __name__ == '__main__':
+    # dfLFP = doAnalysis(fuelLFP)
+    # dfLFP.to_csv('fuelLFP.csv')
+    dfLFP = pd.read_csv('fuelLFP.csv')
+    MakePlots(dfLFP, 'LFP 2015')
+
+    # dfSom = doAnalysis(fuelSom100pct)
+    # dfSom.to_csv('fuelSom.csv')
+    # MakePlots(dfSom, 'Somandepalli 100pct')
+    #
+    # df10Ah = doAnalysis(fuel10Ah)
+    # df10Ah.to_csv('fuel10Ah.csv')
+    # MakePlots(df10Ah, 'UTFRG 10Ah 100pct')
+    #
+    # dfCO= doAnalysis({'H2':1})
+    #
+    # dfMethane = doAnalysis({'CH4':1})
+    # dfMethane.to_csv('methane.csv')
+    # MakePlots(dfMethane, 'Methane')
+    #
+    # dfCO = doAnalysis({'CO':1})
+    # dfCO.to_csv('CO.csv')
+    # MakePlots(dfCO, 'CO')
+    #
+    # dfH2 = doAnalysis({'H2':1})
+    # dfH2.to_csv('H2.csv')
+    # MakePlots(dfH2, 'H2')
+    #
+    # MakePlots(rw10Ah, rw10Ah, df10Ah)
+    # MakePlots(rwMethane, rwMethane2, dfMethane)
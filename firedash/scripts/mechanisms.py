@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Registry of parsed Cantera mechanisms.
+
+Parsing `gri30.xml` dominates the cost of creating a phase, so each
+mechanism is parsed once per thread and slot and handed out again with its
+state reset instead of being parsed anew.
+"""
+
+import threading
+
+import cantera as ct
+
+GRI30 = 'gri30.xml'
+GRI30_MIX = 'gri30_mix'
+GRAPHITE = 'graphite.xml'
+
+_local = threading.local()
+
+
+def get_solution(mechanism=GRI30, phase=GRI30_MIX, slot=None):
+    """ Get a Cantera phase from the registry.
+
+    The phase is owned by the registry: the next call with the same
+    mechanism, phase and slot from the same thread returns the same object,
+    reset to the state it had right after parsing.
+
+    Parameters
+    ----------
+    mechanism : Unicode
+        Mechanism file name, e.g. 'gri30.xml'.
+    phase : Unicode
+        Name of the phase in the mechanism, None for the default phase.
+    slot : Hashable
+        Independent instance name, for callers that need several phases of
+        the same mechanism at once.
+
+    Returns
+    -------
+    cantera.Solution
+        Phase in its initial state.
+    """
+    phases = getattr(_local, 'phases', None)
+    if phases is None:
+        phases = _local.phases = {}
+
+    key = (mechanism, phase, slot)
+    if key not in phases:
+        if phase is None:
+            solution = ct.Solution(mechanism)
+        else:
+            solution = ct.Solution(mechanism, phase)
+        phases[key] = (solution, solution.TPX)
+
+    solution, initial_state = phases[key]
+    solution.TPX = initial_state
+    return solution
+
+
+def clear():
+    """ Drop all phases parsed by the calling thread. """
+    _local.phases = {}
@@ -5,10 +5,13 @@ Created on Jan 3 2019
 @author: erik archibald & Austin Baird
 """
 
-import cantera as ct
 import numpy as np
 import pandas as pd
 
+from checkpoint import CheckpointStore, run_key
+from equilibrium import equilibrate
+from flame_speed import flame_speed_key, flame_speed_sweep
+
 fuel_species = 'H2:1'  # H2
 # fuel_species = {'H2':1}  # Hydrogen Fuel
 # fuel_species = 'C3H8:1'  # Propane
@@ -45,53 +48,52 @@ gas_list = ['CO2', 'CO', 'H2', 'CH4', 'C2H4',
 # Cantera setup
 Pi = 101000  # Initial pressure Pa
 Ti = 300  # Initial unburned gas temperature K
-carbon = ct.Solution('graphite.xml')
-# Calls Gas Properties from Gri-MECH
-gas = ct.Solution('gri30.xml', 'gri30_mix')
 
-# MAIN LOOP Do calculations for each row of gas data
-for index, row in df.iterrows():
+# Results are checkpointed per composition and phi as soon as they are
+# computed, a restarted run skips everything that is already done
+store = CheckpointStore('Literature_Gas_Analysis.sqlite')
+
+
+def row_fuel(row):
+    """ Fuel composition of a row of gas data, propane is the balance. """
     gas_comp = row[gas_list].fillna(0).values
-    fuel = dict(zip(gas_list, row[gas_list].fillna(0).values))
+    fuel = dict(zip(gas_list, gas_comp))
     fuel['C3H8'] = 100 - sum(gas_comp) + fuel['C3H8']
+    return fuel
+
 
-    # Calculate Laminar Flamespeed for different equivalence ratios (phi)
+# Calculate Laminar Flamespeeds of all rows at once, rows are solved in
+# parallel and every phi continues from the flame of the previous phi
+if Do_Flamespeed:
+    flamespeeds = dict(zip(df.index, flame_speed_sweep(
+        [row_fuel(row) for _, row in df.iterrows()],
+        store_path='Literature_Gas_Analysis.sqlite')))
+
+# MAIN LOOP Do calculations for each row of gas data
+for index, row in df.iterrows():
+    fuel = row_fuel(row)
+    run = run_key('vent_gas_analysis', fuel)
+
+    # Laminar flamespeeds for different equivalence ratios (phi)
     if Do_Flamespeed:
-        for phi in np.arange(0.5, 1.6, 0.05):
-            try:
-                gas.set_equivalence_ratio(phi, fuel, 'O2:1.0, N2:3.76')
-                mix = ct.Mixture([(gas, 1.0), (carbon, 0.0)])
-                mix.T = Ti
-                mix.P = Pi
-
-                # Laminar Flame Speed
-                # A freely-propagating flat flame
-                f = ct.FreeFlame(gas, width=5)
-                # Energy equation enabled
-                f.energy_enabled = True
-                f.set_max_time_step(50000)
-                f.set_refine_criteria(ratio=2.0, slope=0.05, curve=0.05)
-                # Solve with multi or mix component transport properties
-                f.transport_model = 'Mix'
-                f.solve(loglevel=1, auto=True, refine_grid=True)  #
-                dfo.loc[index, 'SL_' + str(phi)] = f.u[0]  #
-                print('Flamespeed Done! ', f.u[0])
-            except Exception:
-                print('ERROR! Something went wrong')
+        for phi, speed in flamespeeds[index].items():
+            dfo.loc[index, flame_speed_key(phi)] = speed
 
     # Calculate Maximum Pressure (Pmax) for different equivalence ratios (phi)
     if Do_Pmax:
         for phi in np.arange(0.5, 1.75, 0.05):
+            column = 'Pm_' + str(phi)
+            if store.done(run, column):
+                dfo.loc[index, column] = store.get(run, column)
+                continue
             try:
-                gas.set_equivalence_ratio(phi, fuel, 'O2:1.0, N2:3.76')
-                mix = ct.Mixture([(gas, 1.0), (carbon, 0.0)])
-                mix.T = Ti
-                mix.P = Pi
                 # Adiabatic Constant Volume
-                mix.equilibrate('UV')
-                print(mix.P)
-                dfo.loc[index, 'Pm_' + str(phi)] = mix.P / Pi
-                print('Pmax Done! ', mix.P / Pi)
+                _, products = equilibrate('UV', Ti, Pi, phi=phi, fuel=fuel,
+                                          oxidizer='O2:1.0, N2:3.76')
+                print(products.P)
+                dfo.loc[index, column] = products.P / Pi
+                store.put(run, column, products.P / Pi)
+                print('Pmax Done! ', products.P / Pi)
             except Exception:
                 print("ERROR!")
 
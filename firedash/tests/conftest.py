@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+# The packages are imported from the firedash directory, like the app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
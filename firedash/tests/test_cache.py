@@ -0,0 +1,13 @@
+import sqlite3
+
+from scripts.cache import DiskCache
+
+
+def test_disk_cache_drops_unreadable_value(tmp_path):
+    cache = DiskCache('test', directory=str(tmp_path))
+    cache.set('key', 1)
+    cache._connect().execute('UPDATE cache SET value = ? WHERE key = ?',
+                             (sqlite3.Binary(b'not a pickle'), 'key'))
+
+    assert cache.get('key', 'missing') == 'missing'
+    assert len(cache) == 0
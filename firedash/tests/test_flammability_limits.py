@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from scripts.flammability_limits import Tblend
+
+
+def test_tblend_pure_fuel():
+    # Flame temperatures at the LFL and the UFL of hydrogen in air
+    assert Tblend({'H2': 1}) == pytest.approx((629, 1168))
+
+
+def test_tblend_blend():
+    # Mole fraction weighted over the fuel gases, the others are ignored
+    Tl, Tu = Tblend({'H2': 1, 'CO': 1, 'N2': 2, 'O2': 1})
+    assert Tl == pytest.approx((629 + 1393) / 2)
+    assert Tu == pytest.approx((1168 + 1269) / 2)